@@ -1,3 +1,9 @@
 
 from .bank import Bank
 from .bankscraper import BankScraper
+from .registry import BankRegistry
+from .transport import Transport
+from .exceptions import FetchError, CircuitOpenError
+from .cache import ResponseCache
+from .throttle import HostLimiter
+from .retry import RetryPolicy, CircuitBreaker
@@ -1,14 +1,17 @@
 # bank.py
+import re
+import time
+import threading
+
 import pandas as pd
 
 from bs4 import BeautifulSoup
-from urllib.request import urlopen
-
-import dateparser as dtparser
 
-from .utils import to_number
+from .dates import parse_report_date
+from .transport import get_default_transport
 
 BANK_PAGE_URL_PATTERN = "http://www.cbr.ru/credit/coinfo.asp?id=%s"
+REPORT_URL_PREFIX = 'http://www.cbr.ru/credit/'
 
 class Bank:
     """
@@ -22,20 +25,95 @@ class Bank:
         Licence number. Must be correct
     name : str
         Name of bank. can be in free format.
+    transport : Transport
+        Used for all requests of the bank and its forms.
+        Process wide default transport if None.
+    index_ttl : float
+        Seconds during which downloaded bank page and its report index
+        are reused by all forms.
     """
+    # Registry keeps thousands of banks, so they have no __dict__
+    __slots__ = ('name', 'bank_id', 'license_number', 'index_ttl', '_transport', '_lock',
+                 '_page', '_index', '_loaded_at')
 
-    def __init__(self, bank_id, license_number,name="Unknown"):
+    def __init__(self, bank_id, license_number,name="Unknown", transport=None, index_ttl=3600):
         self.name = name
         self.bank_id = bank_id
         self.license_number = license_number
+        self.index_ttl = index_ttl
+        self._transport = transport
+        self._lock = threading.Lock()
+        self.invalidate()
+
+    def __getstate__(self):
+        # Parsed page is large and can be downloaded again, index is kept
+        return {name: getattr(self, name) for name in self.__slots__
+                if name not in ('_lock', '_page')}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._lock = threading.Lock()
+        self._page = None
+
+    @property
+    def transport(self):
+        return self._transport or get_default_transport()
 
     def __repr__(self):
         return "(%s) Лиц. № %s - %s" % (self.bank_id, self.license_number, self.name)
 
+    def invalidate(self):
+        """Forget downloaded bank page and report index"""
+        self._page = None
+        self._index = None
+        self._loaded_at = 0
+
+    def _expired(self):
+        return time.time() - self._loaded_at > self.index_ttl
+
     def _open_bank_page(self):
-        page = urlopen(BANK_PAGE_URL_PATTERN % self.bank_id)
-        soup = BeautifulSoup(page.read(),'html.parser')
-        return soup
+        with self._lock:
+            if self._page is None or self._expired():
+                page = self.transport.get(BANK_PAGE_URL_PATTERN % self.bank_id)
+                self._page = BeautifulSoup(page,'html.parser')
+                self._index = None
+                self._loaded_at = time.time()
+            return self._page
+
+    @property
+    def report_index(self):
+        """
+        Reports available on the bank page.
+
+        Returns
+        -------
+        index : dict
+            form id (f_101, f_102, ...) -> list of (date, url), newest first
+        """
+        if self._index is not None and not self._expired():
+            return self._index
+
+        soup = self._open_bank_page()
+        index = {}
+        reports = soup.find('div', {'class':'reports'})
+        if reports is not None:
+            for form in reports.findAll('div', {'id':re.compile('^f_')}):
+                switched = form.find('div',{'class':'switched'})
+                if switched is None:
+                    continue
+                dates = []
+                for el in switched.findAll('div',{'class':'normal'}):
+                    year = el['id'][-4:]
+                    dates.extend([parse_report_date(a.text[3:] + ' ' + year) for a in el.findAll('a')])
+                urls = [(REPORT_URL_PREFIX + a['href']).replace('®','&reg') for a in form.findAll('a')]
+                index[form['id']] = list(zip(dates, urls))
+        self._index = index
+        return index
+
+    def get_reports(self, form_name):
+        """Returns list of (date, url) for form in f_xxx format"""
+        return self.report_index.get(form_name, [])
 
     def get_main_info(self):
         """
@@ -63,62 +141,11 @@ class Bank:
         return main_info
 
 
-    def _find_form(self, form_name):
-        """name in f_xxx format. For example f_101, f_102 etc."""
-        soup = self._open_bank_page()
-        reports =  soup.find('div' , {'class':'reports'})
-        form = reports.find('div', {'id':form_name})
-        return soup, form
-
-
     def get_form135(self, first_n=None):
-        soup = self._open_bank_page()
-
-        reports =  soup.find('div' , {'class':'reports'})
-        f_135 = reports.find('div', {'id':'f_135'})
-
-        if f_135 is None:
-            return pd.DataFrame()
-
-        # Get list of reporting dates
-        dates = []
-        for el in f_135.find('div',{'class':'switched'}).findAll('div',{'class':'normal'}):
-            year = el['id'][-4:]
-            dates.extend([dtparser.parse(a.text[3:] + ' ' + year) for a in el.findAll('a')])
-
-
-        f_135 = f_135.findAll('a')
-
-        urls = [('http://www.cbr.ru/credit/'+a['href']).replace('®','&reg') for a in f_135]
-
-        if first_n is None:
-            first_n = len(urls)
-
-        f_135 = pd.DataFrame()
-
-        for url, date in zip(urls[:first_n], dates[:first_n]):
-
-            page = urlopen(url).read()
-            tables = pd.read_html(page)
-
-            transcripts = tables[1].drop(0)
-            norms = tables[2][[0,1]].drop(0).fillna(0)
-            norms[1] = norms[1].map(lambda x: int(str(x))/100)
-            print(norms)
-            ul = BeautifulSoup(page, 'html.parser').find('ul', {'class':'without_dash without_indent'})
-            indicators = []
-            for li in ul.findAll('li'):
-                li = ''.join(str(li.text).split())
-                indicators.append([li[:li.find('=')],li[li.find('=')+1:]])
-
-            indicators = pd.DataFrame(indicators)
-            table = pd.concat([transcripts, norms, indicators]).set_index(0).fillna(0)
-            table[1] = table[1].astype(np.str).map(to_number)
-            table = table.T
-            table['date'] = date
-
-            f_135 = pd.concat([f_135, table]).fillna(0)
-
-        f_135['index'] = self.bank_id
+        """Form 135 of the bank as DataFrame, see forms.Form135"""
+        # forms import Bank
+        from .forms import Form135
 
-        return f_135
+        form = Form135(self)
+        form.fill(first_n)
+        return form.to_dataframe() if form.is_filled else pd.DataFrame()
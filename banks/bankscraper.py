@@ -1,38 +1,90 @@
 import re
 import os
 import time
+import asyncio
 
-from multiprocessing import Pool, cpu_count
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 from bs4 import BeautifulSoup
-from urllib.request import urlopen
 
-from .bank import Bank
-from .forms import Form101, Form102
+from .bank import BANK_PAGE_URL_PATTERN
+from .crawl import Crawler
+from .exceptions import FetchError
+from .registry import BankRegistry
+from .journal import Checkpoint
+from .transport import get_default_transport
+from .forms import Form101, Form102, Form123, Form135, FormPanel
+from .forms.base import FailedUnit
+from .forms.parsing import ReportPage
+
+ACTIVE_BANKS_URL = 'http://www.cbr.ru/credit/transparent.asp'
+BANKI_URL = 'http://www.banki.ru'
+MEMORY_URL = BANKI_URL + '/banks/memory/'
+
+_PAGE = re.compile(r'PAGEN_1=(\d+)')
+
+# Difference between two loads of banks lists
+RegistryChanges = namedtuple('RegistryChanges', ['opened', 'closed', 'renamed'])
+
 
 class BankScraper:
     """
     Scrap closed banks data from banki.ru
+
+    Parameters
+    ----------
+    concurrency : int
+        Number of simultaneous requests. Loading is I/O bound, so it does
+        not depend on the number of cores.
+    transport : Transport
+        Used for all requests, also passed to created banks.
+        Process wide default transport if None.
+    executor : Executor
+        Runs requests of get_banks, anything with map(func, iterable), e.g.
+        shared ThreadPoolExecutor. Thread pool of `concurrency` threads
+        created for every get_banks call if None.
+    processes : int
+        Old name of concurrency, used instead of it if given.
     """
 
-    def __init__(self, processes=cpu_count()):
-        self._n = processes
+    active_banks = None
+    closed_banks = None
+
+    def __init__(self, concurrency=32, transport=None, executor=None, processes=None):
+        self._n = concurrency if processes is None else processes
+        self._transport = transport
+        self._executor = executor
         print("Pool size:",self._n)
 
+    @property
+    def transport(self):
+        return self._transport or get_default_transport()
+
     def _get_closing_info(self, url):
-        """Gather info about closed banks from a single page"""
-        page = urlopen(url).read()
-        closed_banks = pd.read_html(page)[2]
-        closed_banks['link'] = pd.Series([a['href'] for a in BeautifulSoup(page, 'lxml').\
-                                       findAll('table')[2].find('tbody').findAll('a')])
-        return closed_banks
+        """
+        Gather info about closed banks from a single page.
+
+        Returns
+        -------
+        closed_banks : DataFrame
+        last_page : int
+            The greatest page number in the page's navigation.
+        """
+        page = ReportPage(self.transport.get(url))
+        rows = [cells[1:6] + [link] for cells, link in page.records(2) if len(cells) >= 6]
+        closed_banks = pd.DataFrame(rows, columns=['bank', 'license_number', 'reason',
+                                                   'date_of_closing', 'city', 'link'])
+        last_page = max([int(n) for href in page.hrefs() for n in _PAGE.findall(href)],
+                        default=1)
+        return closed_banks, last_page
 
 
     def _get_description(self, bank_url):
         """Returns description for a single bank from it's memory page"""
-        url = 'http://www.banki.ru'+ bank_url
-        page = urlopen(url).read()
+        url = BANKI_URL + bank_url
+        page = self.transport.get(url)
         bank_description = BeautifulSoup(page,'lxml').find('dl')
         description = pd.DataFrame(
             data = [' '.join(dt.text.split()) for dt in bank_description.findAll('dd')],
@@ -47,21 +99,14 @@ class BankScraper:
 
         return description
 
-    def get_banks(self):
-        """
-        Allow to download bank's data.
-
-        """
-        start_time = time.time()
-        print('Loading active banks...')
-
-        # First: scraping active banks list from cbr.ru
-        page = urlopen('http://www.cbr.ru/credit/transparent.asp').read()
+    def _get_active_banks(self):
+        """Active banks list from cbr.ru"""
+        page = self.transport.get(ACTIVE_BANKS_URL)
 
         ## Cleaning up in taken table
         cbr_bank_list_df = pd.read_html(page)[0]
         cbr_bank_list_df.drop([4,5,6],axis=1, inplace=True)
-        cbr_bank_list_df.columns = cbr_bank_list_df.ix[0]
+        cbr_bank_list_df.columns = cbr_bank_list_df.iloc[0]
         cbr_bank_list_df.drop([0,1],axis=0, inplace=True)
         cbr_bank_list_df.drop(['Раскрытие информации'],axis=1, inplace=True)
 
@@ -70,37 +115,60 @@ class BankScraper:
         ids = re.findall('javascript:info\((.+?)\)', text)
         cbr_bank_list_df['№'] = ids
         cbr_bank_list_df.columns = ['id', 'license_number', 'name']
-        self.active_banks = cbr_bank_list_df
-        print('Done! Time spent: %d sec.' % (time.time()-start_time))
-        print('\nLoading closed banks...')
-        start_time = time.time()
-        # Load list of closed banks
-        first_page = 'http://www.banki.ru/banks/memory/'
-        all_pages = [(first_page + '?PAGEN_1=%d') % x for x in range(2,51)]
-        all_pages.insert(0, first_page)
+        return cbr_bank_list_df
 
-        # First: scrapping closed banks from ~50 pages on banki.ru
-        with Pool(processes=self._n) as pool:
-            results = pool.map(
-                self._get_closing_info,
-                all_pages,
-                )
-
-        ## Cleaning up
-        self.closed_banks = pd.concat(results)
-        self.closed_banks.columns = ['index', 'bank', 'license_number',
-                                     'reason', 'date_of_closing', 'city','link']
-        self.closed_banks = self.closed_banks.drop('index', axis=1).drop_duplicates('license_number')
+    def _get_closed_list(self, executor, known=None):
+        """
+        Closed banks list from banki.ru memory book without descriptions.
 
-        print('Done! Time spent: %d sec.' % (time.time()-start_time))
-        start_time = time.time()
-        ### scrapping bank's descriptions from memory book on banki.ru
-        print('\nLoading descriptions for %d closed banks...''Wait a while!' % len(self.closed_banks))
-        with Pool(processes=self._n) as pool:
-            results = pool.map(
-                self._get_description,
-                (bank.link for bank in self.closed_banks.itertuples(index=False)),
-                )
+        Number of pages is taken from the first page's navigation, the rest
+        are loaded concurrently. Loading stops at an empty page or a page of
+        already seen banks (banki.ru returns the last page for numbers out
+        of range).
+
+        The list is sorted by date of closing, so when licenses of already
+        loaded banks are `known`, pages are read one by one until a page
+        without new banks.
+        """
+        closed_banks, last_page = self._get_closing_info(MEMORY_URL)
+        results = [closed_banks]
+        seen = set(closed_banks.license_number)
+        known = set(known) if known is not None else None
+
+        n = 1
+        while n < last_page and not (known is not None and seen <= known):
+            urls = [(MEMORY_URL + '?PAGEN_1=%d') % x for x in range(n + 1, last_page + 1)]
+            if known is None:
+                pages = executor.map(self._get_closing_info, urls)
+            else:
+                pages = (self._get_closing_info(url) for url in urls)
+
+            next_last_page = last_page
+            for closed_banks, page_last in pages:
+                n += 1
+                licenses = set(closed_banks.license_number)
+                # Requests of the next pages are cancelled when the
+                # generator is released
+                if not licenses or licenses <= seen:
+                    break
+                seen |= licenses
+                results.append(closed_banks)
+                next_last_page = max(next_last_page, page_last)
+                if known is not None and licenses <= known:
+                    break
+            else:
+                # Navigation shows only neighbour pages on long lists
+                last_page = next_last_page
+                continue
+            break
+
+        return pd.concat(results).drop_duplicates('license_number')
+
+    def _add_descriptions(self, closed_banks, executor):
+        """Merge closed banks list with descriptions from their memory pages"""
+        results = list(executor.map(
+            self._get_description,
+            [bank.link for bank in closed_banks.itertuples(index=False)]))
         #### Cleaning up
         closed_descriptions = pd.concat(results).fillna("")
         closed_descriptions.columns = ['id',  'city','date_of_closing',
@@ -115,20 +183,206 @@ class BankScraper:
             axis=1).drop_duplicates('license_number')
 
         print(closed_descriptions.shape)
-        #return closed_descriptions, self.closed_banks
         ##### Merge downloaded dataframes into one
-        self.closed_banks.license_number = self.closed_banks.license_number.map(lambda x: str(x))
         closed_descriptions.license_number = closed_descriptions.license_number.map(lambda x: str(x))
 
-        self.closed_banks = self.closed_banks.merge(
+        return closed_banks.merge(
             closed_descriptions,
             on='license_number',
             )
 
+    def _run(self, method, *args):
+        """Call method with the scraper's executor"""
+        executor = self._executor or ThreadPoolExecutor(self._n)
+        self.transport.reserve(self._n)
+        try:
+            return method(executor, *args)
+        finally:
+            if self._executor is None:
+                executor.shutdown()
+
+    def get_banks(self):
+        """
+        Allow to download bank's data.
+
+        """
+        return self._run(self._get_banks)
+
+    def _get_banks(self, executor):
+        start_time = time.time()
+        print('Loading active banks...')
+
+        # First: scraping active banks list from cbr.ru
+        self.active_banks = self._get_active_banks()
+        print('Done! Time spent: %d sec.' % (time.time()-start_time))
+        print('\nLoading closed banks...')
+        start_time = time.time()
+
+        # First: scrapping closed banks from ~50 pages on banki.ru
+        closed_banks = self._get_closed_list(executor)
+
+        print('Done! Time spent: %d sec.' % (time.time()-start_time))
+        start_time = time.time()
+        ### scrapping bank's descriptions from memory book on banki.ru
+        print('\nLoading descriptions for %d closed banks...''Wait a while!' % len(closed_banks))
+        self.closed_banks = self._add_descriptions(closed_banks, executor)
+
         print('Done! Time spent: %d sec.' % (time.time()-start_time))
 
         return self
 
+    def refresh(self):
+        """
+        Update loaded (or read from csv) lists of banks.
+
+        Active list is loaded again, closed list pages are read only until
+        already known banks and descriptions are loaded only for newly
+        closed banks, so a refresh takes a few requests.
+
+        Returns
+        -------
+        changes : RegistryChanges
+            Banks opened and closed (rows of active lists) and renamed
+            (license_number, old_name, new_name) since the previous load.
+        """
+        if self.active_banks is None or self.closed_banks is None:
+            raise ValueError('Banks should be loaded first!')
+        return self._run(self._refresh)
+
+    def _refresh(self, executor):
+        start_time = time.time()
+        old_active = self.active_banks.assign(
+            license_number=self.active_banks.license_number.astype(str))
+        new_active = self._get_active_banks()
+        new_active = new_active.assign(license_number=new_active.license_number.astype(str))
+
+        known = set(self.closed_banks.license_number.astype(str))
+        closed_banks = self._get_closed_list(executor, known)
+        closed_banks = closed_banks[~closed_banks.license_number.isin(known)]
+        if len(closed_banks):
+            closed_banks = self._add_descriptions(closed_banks, executor)
+            self.closed_banks = pd.concat([closed_banks, self.closed_banks.assign(
+                license_number=self.closed_banks.license_number.astype(str))], ignore_index=True)
+        self.active_banks = new_active
+
+        names = old_active[['license_number', 'name']].merge(
+            new_active[['license_number', 'name']], on='license_number',
+            suffixes=('_old', '_new'))
+        renamed = names[names.name_old != names.name_new]
+        changes = RegistryChanges(
+            opened=new_active[~new_active.license_number.isin(old_active.license_number)],
+            closed=old_active[~old_active.license_number.isin(new_active.license_number)],
+            renamed=renamed.rename(columns={'name_old': 'old_name', 'name_new': 'new_name'}))
+
+        print('Done! Time spent: %d sec. Opened: %d, closed: %d, renamed: %d' % (
+            time.time()-start_time, len(changes.opened), len(changes.closed), len(changes.renamed)))
+        return changes
+
+
+    async def aload_forms(self, banks, forms=(Form101, Form102, Form123, Form135),
+                          concurrency=100, journal=None, store=None, checkpoint=100,
+                          **kwargs):
+        """
+        Asynchronous version of load_forms.
+        """
+        start_time = time.time()
+        saver = Checkpoint(journal, store, checkpoint)
+        crawler = Crawler(concurrency, self._transport)
+        jobs = self._jobs(banks, forms, journal)
+
+        async def load(job):
+            result = await job.afill(crawler=crawler, **kwargs)
+            saver.add(job)
+            return result
+
+        try:
+            results = await asyncio.gather(*(load(job) for job in jobs), return_exceptions=True)
+        finally:
+            crawler.close()
+        saver.flush()
+
+        failed = []
+        for job, result in zip(jobs, results):
+            if isinstance(result, FetchError):
+                # Bank page itself could not be loaded, errors of report
+                # pages are in job.failed
+                failed.append(FailedUnit(job.bank.bank_id, job.form_type, None,
+                                         BANK_PAGE_URL_PATTERN % job.bank.bank_id, result))
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            failed.extend(job.failed)
+
+        return self._panels(jobs, failed, start_time)
+
+    @staticmethod
+    def _jobs(banks, forms, journal=None):
+        jobs = [form(bank) for bank in banks for form in forms]
+        for job in jobs:
+            job.journal = journal
+        return jobs
+
+    @staticmethod
+    def _panels(jobs, failed, start_time):
+        filled = {}
+        for job in jobs:
+            if job.is_filled:
+                filled.setdefault(job.form_type, []).append(job)
+
+        panels = {form_type: FormPanel.from_forms(forms) for form_type, forms in filled.items()}
+        print('Done! Time spent: %d sec. Failed: %d' % (time.time()-start_time, len(failed)))
+        return panels, failed
+
+    def load_forms(self, banks, forms=(Form101, Form102, Form123, Form135),
+                   concurrency=100, pipeline=None, journal=None, store=None,
+                   checkpoint=100, **kwargs):
+        """
+        Load several forms for several banks in a single crawl.
+
+        Bank page of every bank is downloaded once, report pages of all
+        banks and forms share one concurrency limit.
+
+        Parameters
+        ----------
+        banks : list of Bank
+        forms : list
+            Form classes (or partials, e.g. for form 134).
+        concurrency : int
+            Max number of simultaneous requests. Connection pool of the
+            transport is extended to this size.
+        pipeline : Pipeline
+            Parse pages in a pool of processes (see banks.pipeline) instead
+            of the event loop's thread. concurrency is ignored then, number
+            of downloading threads is set by the pipeline.
+        journal : CrawlJournal
+            Reports done in previous runs are skipped, so an interrupted
+            crawl can be started again (see banks.journal). Only new reports
+            are in the returned panels then, all data is in the store.
+            Requires store.
+        store : FormStore
+            Loaded forms are written there every `checkpoint` forms.
+        checkpoint : int
+            Number of forms saved (and committed to the journal) at once.
+        kwargs :
+            Passed to fill of every form: first_n, dates, since, until.
+
+        Returns
+        -------
+        panels : dict
+            form type (f_101, ...) -> FormPanel of all banks having the form
+        failed : list of FailedUnit
+            Reports (or whole banks with date None) which were not loaded.
+        """
+        if pipeline is None:
+            return asyncio.run(self.aload_forms(banks, forms, concurrency, journal, store,
+                                                checkpoint, **kwargs))
+
+        start_time = time.time()
+        saver = Checkpoint(journal, store, checkpoint)
+        jobs = self._jobs(banks, forms, journal)
+        failed = pipeline.run(jobs, callback=saver.add, **kwargs)
+        saver.flush()
+        return self._panels(jobs, failed, start_time)
 
     def to_csv(self, path='../'):
         self.closed_banks.to_csv(os.path.join(path,'closed_banks.csv'), index=False)
@@ -140,6 +394,19 @@ class BankScraper:
         self.active_banks = pd.read_csv(os.path.join(path,'active_banks.csv'))
         return self
 
+    @property
+    def registry(self):
+        """
+        BankRegistry of loaded banks with lookups by id, license and name.
+        Built once for the current active_banks and closed_banks.
+        """
+        source = (self.active_banks, self.closed_banks)
+        cached = self.__dict__.get('_registry')
+        if cached is None or any(a is not b for a, b in zip(cached[0], source)):
+            cached = (source, BankRegistry(self.active_banks, self.closed_banks, self._transport))
+            self._registry = cached
+        return cached[1]
+
     @property
     def closed_banks_list(self):
         """
@@ -149,9 +416,8 @@ class BankScraper:
         if self.closed_banks is None:
             raise ValueError('Closed banks should be loaded first!')
 
-        return [Bank(bank.id, bank.license_number, bank.bank)
-                    for bank in self.closed_banks.itertuples(index=False)
-                        if str(bank.id) != '-1']
+        return self.registry.closed
+
     @property
     def active_banks_list(self):
         """Returns list of Active Bank class instances"""
@@ -159,5 +425,4 @@ class BankScraper:
         if self.active_banks is None:
             raise ValueError('Active banks should be loaded first!')
 
-        return [Bank(bank.id,bank.license_number,bank.name)
-                    for bank in self.active_banks.itertuples(index=False)]
+        return self.registry.active
@@ -0,0 +1,129 @@
+# cache.py
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+
+# Pages which change over time and must be revalidated. Everything else
+# (dated report pages, descriptions of closed banks) never changes.
+VOLATILE_PATTERNS = (
+    r'/credit/coinfo\.asp',
+    r'/credit/transparent\.asp',
+    r'banki\.ru/banks/memory/(\?PAGEN_1=\d+)?$',
+)
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache of HTTP responses.
+
+    Every response is stored under the hash of its url as two files: body
+    and json with url, headers and fetch time. Immutable pages are served
+    from the cache without any request, volatile ones are revalidated with
+    ETag/Last-Modified.
+
+    Parameters
+    ----------
+    path : str
+        Cache directory. Created if not exists.
+    volatile : list of str
+        Regular expressions for urls of pages which can change.
+    max_age : float
+        Seconds during which volatile page is served without revalidation.
+    """
+
+    def __init__(self, path, volatile=VOLATILE_PATTERNS, max_age=0):
+        self.path = path
+        self.volatile = tuple(volatile)
+        self.max_age = max_age
+        self._volatile = [re.compile(p) for p in self.volatile]
+        os.makedirs(path, exist_ok=True)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_volatile']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._volatile = [re.compile(p) for p in self.volatile]
+
+    def __repr__(self):
+        return 'ResponseCache(%r)' % self.path
+
+    def _file(self, url):
+        key = hashlib.sha256(url.encode('utf8')).hexdigest()
+        return os.path.join(self.path, key[:2], key)
+
+    def is_volatile(self, url):
+        return any(p.search(url) for p in self._volatile)
+
+    def load(self, url):
+        """Returns (meta, body) for cached url or None"""
+        name = self._file(url)
+        try:
+            with open(name + '.json', encoding='utf8') as f:
+                meta = json.load(f)
+            with open(name, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def store(self, url, headers, body):
+        """Save response. Body is written before meta, so a crash never leaves meta without body"""
+        name = self._file(url)
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+        meta = {
+            'url': url,
+            'headers': {k: v for k, v in headers.items() if k in ('etag', 'last-modified', 'content-type')},
+            'fetched_at': time.time(),
+        }
+        self._write(name, body)
+        self._write(name + '.json', json.dumps(meta, ensure_ascii=False).encode('utf8'))
+
+    def touch(self, url, meta):
+        """Mark cached response as just revalidated"""
+        meta['fetched_at'] = time.time()
+        self._write(self._file(url) + '.json', json.dumps(meta, ensure_ascii=False).encode('utf8'))
+
+    def evict(self, url):
+        """Remove cached response, e.g. a page which could not be parsed"""
+        name = self._file(url)
+        # Meta first, so a crash never leaves meta without body
+        for path in (name + '.json', name):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _write(name, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(name))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, name)
+
+    def is_fresh(self, url, meta):
+        """Whether cached response can be used without request"""
+        if not self.is_volatile(url):
+            return True
+        return time.time() - meta['fetched_at'] < self.max_age
+
+    @staticmethod
+    def validators(meta):
+        """Headers for conditional request"""
+        headers = {}
+        if 'etag' in meta['headers']:
+            headers['If-None-Match'] = meta['headers']['etag']
+        if 'last-modified' in meta['headers']:
+            headers['If-Modified-Since'] = meta['headers']['last-modified']
+        return headers
+
+    def clear(self):
+        """Remove all cached responses"""
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                os.remove(os.path.join(root, name))
@@ -0,0 +1,100 @@
+# crawl.py
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .transport import get_default_transport
+
+
+class Crawler:
+    """
+    Bounded concurrency asyncio crawler.
+
+    Standard library has no asynchronous HTTP client, so blocking requests
+    of the pooled Transport are run in a thread pool, while the event loop
+    keeps at most `concurrency` of them in flight.
+
+    Parameters
+    ----------
+    concurrency : int
+        Max number of simultaneous requests. Connection pools of used
+        transports are extended to this size, so every request in flight
+        keeps its connection alive.
+    transport : Transport
+        Default transport for fetch(). Process wide default if None.
+    """
+
+    def __init__(self, concurrency=100, transport=None):
+        self.concurrency = concurrency
+        self._transport = transport
+        self._executor = None
+        self._loop = None
+        self._semaphore = None
+
+    @property
+    def transport(self):
+        return self._transport or get_default_transport()
+
+    def _bind(self):
+        """Create loop bound primitives for the running loop"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.concurrency)
+            self.transport.reserve(self.concurrency)
+        return loop
+
+    async def run(self, func, *args):
+        """Run blocking function in the crawler's pool respecting concurrency"""
+        loop = self._bind()
+        async with self._semaphore:
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def fetch(self, url, transport=None):
+        """Returns body of the page"""
+        transport = transport or self.transport
+        transport.reserve(self.concurrency)
+        return await self.run(transport.get, url)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+async def afill_forms(banks, form, first_n=None, concurrency=100, crawler=None):
+    """
+    Fill given form for every bank concurrently.
+
+    Parameters
+    ----------
+    banks : list of Bank
+    form : callable
+        Form class (or partial) taking bank as the only argument.
+    first_n : int
+        Number of last reports to load for every bank.
+    concurrency : int
+        Max number of simultaneous requests for all banks together.
+
+    Returns
+    -------
+    forms : list
+        Filled forms in order of banks. Exception instance for banks
+        that failed to load.
+    """
+    own = crawler is None
+    crawler = crawler or Crawler(concurrency)
+    try:
+        return await asyncio.gather(
+            *(form(bank).afill(first_n, crawler=crawler) for bank in banks),
+            return_exceptions=True)
+    finally:
+        if own:
+            crawler.close()
+
+
+def fill_forms(banks, form, first_n=None, concurrency=100):
+    """Synchronous wrapper around afill_forms"""
+    return asyncio.run(afill_forms(banks, form, first_n, concurrency))
@@ -0,0 +1,61 @@
+# dates.py
+import re
+
+from datetime import datetime
+from functools import lru_cache
+
+MONTHS = {
+    'январь': 1, 'января': 1,
+    'февраль': 2, 'февраля': 2,
+    'март': 3, 'марта': 3,
+    'апрель': 4, 'апреля': 4,
+    'май': 5, 'мая': 5,
+    'июнь': 6, 'июня': 6,
+    'июль': 7, 'июля': 7,
+    'август': 8, 'августа': 8,
+    'сентябрь': 9, 'сентября': 9,
+    'октябрь': 10, 'октября': 10,
+    'ноябрь': 11, 'ноября': 11,
+    'декабрь': 12, 'декабря': 12,
+}
+
+# "[1] августа 2016" or "01.08.2016"
+_MONTH_DATE = re.compile(r'^(?:(\d{1,2})\s+)?([а-яё]+)\s+(\d{4})$')
+_NUMERIC_DATE = re.compile(r'^(\d{1,2})\.(\d{1,2})\.(\d{4})$')
+
+
+@lru_cache(maxsize=4096)
+def parse_report_date(text):
+    """
+    Parse reporting date from the bank page, e.g. 'Августа 2016'.
+
+    Month names in nominative or genitive case with optional day
+    (the first day of month by default) and dd.mm.yyyy dates are parsed
+    directly, anything else is passed to dateparser.
+
+    Returns
+    -------
+    date : datetime or None
+    """
+    cleaned = ' '.join(text.lower().split())
+
+    # Matching text which is not a real date (31 февраля) is left to dateparser
+    match = _MONTH_DATE.match(cleaned)
+    if match and match.group(2) in MONTHS:
+        day, month, year = match.groups()
+        try:
+            return datetime(int(year), MONTHS[month], int(day or 1))
+        except ValueError:
+            pass
+
+    match = _NUMERIC_DATE.match(cleaned)
+    if match:
+        day, month, year = map(int, match.groups())
+        try:
+            return datetime(year, month, day)
+        except ValueError:
+            pass
+
+    # dateparser is slow to import, so it is loaded only for unknown formats
+    import dateparser
+    return dateparser.parse(text)
@@ -0,0 +1,30 @@
+# exceptions.py
+
+
+class FetchError(IOError):
+    """
+    Raised when a page can not be fetched.
+
+    Parameters
+    ----------
+    url : str
+        Requested url.
+    status : int or None
+        HTTP status code, None for network errors.
+    reason : str
+        Human readable description.
+    """
+
+    def __init__(self, url, status=None, reason=''):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        super().__init__('%s: %s %s' % (url, status or '', reason))
+
+    def __reduce__(self):
+        # Failed units are sent between processes with their errors
+        return type(self), (self.url, self.status, self.reason)
+
+
+class CircuitOpenError(FetchError):
+    """Raised without request when too many requests to the host have failed"""
@@ -2,3 +2,4 @@ from .form101 import Form101
 from .form102 import Form102
 from .form123 import Form123
 from .form135 import Form135
+from .panel import FormPanel
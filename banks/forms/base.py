@@ -0,0 +1,368 @@
+import time
+import asyncio
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ..bank import Bank
+from ..crawl import Crawler
+from ..exceptions import FetchError
+from ..journal import content_hash
+
+# Unit of work which could not be loaded: (bank, form, date) and the reason
+FailedUnit = namedtuple('FailedUnit', ['bank_id', 'form_type', 'date', 'url', 'error'])
+
+# Errors of parsing a page with unexpected layout
+PARSE_ERRORS = (ValueError, KeyError, IndexError)
+
+
+class FormNode:
+    """
+    Node of reporting form's structure - the whole form or one of its parts.
+
+    Keeps only reference to the form and to the node of its template, child
+    units are created on first attribute access.
+
+    """
+    # Class of child units, type(self) if None
+    _unit_class = None
+
+    def __init__(self, form, node):
+        self.form = form
+        self._node = node
+
+    def __getattr__(self, name):
+        node = self.__dict__.get('_node')
+        if node is None or name not in node.children:
+            raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
+        unit = (self._unit_class or type(self))(self.form, node.children[name])
+        self.__dict__[name] = unit
+        return unit
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(self._node.children)
+
+    @property
+    def index(self):
+        """Positions of the unit's line items in the form"""
+        return self._node.index
+
+    @property
+    def balances(self):
+        """
+        2-D array (dates x line items) of the unit's balances. It is a view
+        of the form's storage when the unit's items are contiguous.
+        """
+        values = self.form._values
+        if values is None:
+            return np.zeros((0, len(self._node.index)))
+        return values[:, self._node.selector]
+
+    def _select(self):
+        items = self.form._line_items
+        return [items[i] for i in self._node.index]
+
+    def to_dataframe(self):
+        """Convert form (or its unit) to pandas DataFrame format"""
+        numbers = self.form.struct.number.values[self._node.selector]
+        df = pd.DataFrame(self.balances, columns=numbers)
+        df['date'] = self.form.date
+        df['bank'] = self.form.bank.bank_id
+        return df
+
+
+class LineItem:
+    """
+    Line item (account, symbol) of a form. Its balance is a column of the
+    form's storage.
+
+    """
+    # Every form has hundreds of items, subclasses define slots of their fields
+    __slots__ = ('_form', '_position')
+
+    def _bind(self, form, position):
+        self._form = form
+        self._position = position
+
+    @property
+    def balance(self):
+        form = getattr(self, '_form', None)
+        if form is None or form._values is None:
+            return np.zeros(0)
+        return form._values[:, self._position]
+
+
+class ReportForm:
+    """
+    Loading logic shared by all reporting forms.
+
+    Subclasses define `form_type` (id of the form's block on the bank page),
+    `_make_items` (list of the form's accounts or symbols) and `_parse_page`
+    converting a single report page into arrays of item numbers and values.
+
+    """
+    form_type = None
+    date = None
+    is_filled = False
+    failed = ()
+    unparsed = ()
+    # CrawlJournal: reports done in previous runs are skipped
+    journal = None
+    # Balances of all line items: 2-D array dates x items
+    _values = None
+    # (date, url, content hash, error, time) of loaded reports for the journal
+    _outcomes = ()
+
+    def _report_links(self, first_n=None, dates=None, since=None, until=None, update=False):
+        """
+        Returns list of (date, url) of available reports from the bank's
+        report index (2016->2015->...) selected by fill's arguments.
+
+        """
+        links = self.bank.get_reports(self.form_type)
+
+        if dates is not None:
+            wanted = set(pd.to_datetime(list(dates)).values.astype('datetime64[ns]'))
+            links = [l for l in links if np.datetime64(l[0], 'ns') in wanted]
+        if since is not None:
+            links = [l for l in links if l[0] >= pd.Timestamp(since)]
+        if until is not None:
+            links = [l for l in links if l[0] <= pd.Timestamp(until)]
+        if update and self.is_filled:
+            present = set(np.asarray(self.date, dtype='datetime64[ns]'))
+            links = [l for l in links if np.datetime64(l[0], 'ns') not in present]
+
+        if not first_n or first_n > len(links):
+            first_n = len(links)
+
+        links = links[:first_n]
+        if self.journal is not None:
+            links = self.journal.start(self, links)
+        return links
+
+    def fill(self, first_n=None, dates=None, since=None, until=None, update=False):
+        """
+        Fill an empty initialized form with values. Load first n forms from
+        cbr.ru site (2016->2015->...)
+
+        Reports which could not be loaded are skipped and listed in `failed`,
+        use retry_failed() to load them later. Cells which are not numbers
+        are counted as 0 and listed in `unparsed` as (date, number, cell).
+
+        Parameters
+        ----------
+        first_n : int
+            Number of last reports to load.
+        dates : list
+            Load only reports for these dates.
+        since, until : date
+            Load only reports in this range (inclusive).
+        update : bool
+            Load only reports for dates which are not in the form yet and
+            merge them with already loaded ones (see also load_dataframe).
+        """
+        links = self._report_links(first_n, dates, since, until, update)
+
+        if not links:
+            return self if self.is_filled else pd.DataFrame()
+
+        self.unparsed = []
+        pages = [self._fetch(url) for _, url in links]
+        return self._finish(*self._collect(links, pages), merge=update)
+
+    async def afill(self, first_n=None, dates=None, since=None, until=None, update=False,
+                    crawler=None):
+        """
+        Asynchronous version of fill. All report pages of the form are
+        requested concurrently.
+
+        Parameters
+        ----------
+        first_n, dates, since, until, update :
+            See fill.
+        crawler : Crawler
+            Shares concurrency limit between several forms. New one is
+            created if None.
+        """
+        own = crawler is None
+        crawler = crawler or Crawler()
+        try:
+            links = await crawler.run(self._report_links, first_n, dates, since, until, update)
+
+            if not links:
+                return self if self.is_filled else pd.DataFrame()
+
+            self.unparsed = []
+            pages = await asyncio.gather(
+                *(crawler.fetch(url, self.transport) for _, url in links),
+                return_exceptions=True)
+        finally:
+            if own:
+                crawler.close()
+
+        return self._finish(*self._collect(links, pages), merge=update)
+
+    def retry_failed(self):
+        """Load reports listed in `failed` and add them to the form"""
+        links = [(unit.date, unit.url) for unit in self.failed]
+        pages = [self._fetch(url) for _, url in links]
+        return self._finish(*self._collect(links, pages), merge=True)
+
+    def load_dataframe(self, df):
+        """
+        Fill the form from DataFrame saved from to_dataframe(), e.g. to load
+        only new periods with fill(update=True) afterwards.
+
+        Rows of other banks are ignored if DataFrame has 'bank' column.
+        """
+        if 'bank' in df:
+            df = df[df['bank'].astype(str) == str(self.bank.bank_id)]
+        df = df.sort_values('date')
+        columns = df.columns.astype(str)
+        values = df.set_axis(columns, axis=1).reindex(columns=self.template.numbers, fill_value=0)
+
+        self.date = pd.to_datetime(df['date']).values
+        self._values = np.ascontiguousarray(values.to_numpy(dtype=float))
+        self.is_filled = True
+        return self
+
+    def __reduce__(self):
+        """
+        Only bank, dates and balances are pickled, e.g. to return filled
+        forms from a process pool. Hierarchy and line items are created
+        again from the shared template, transport is the default one of
+        the receiving process.
+        """
+        bank = self.bank
+        return _restore, (type(self), self.form_type,
+                          (bank.bank_id, bank.license_number, bank.name),
+                          self.date, self._values, list(self.failed), list(self.unparsed))
+
+    def _fetch(self, url):
+        """Returns body of the page or FetchError"""
+        try:
+            return self.transport.get(url)
+        except FetchError as e:
+            return e
+
+    def _collect(self, links, pages):
+        """Parse fetched pages. Returns tables and list of FailedUnit"""
+        results = []
+        for (date, url), page in zip(links, pages):
+            if not isinstance(page, BaseException):
+                try:
+                    page = self._parse_page(page)
+                except PARSE_ERRORS as e:
+                    page = e
+            results.append((date, url, page))
+        return self._gather(results)
+
+    def _gather(self, results):
+        """
+        Split (date, url, parsed page or error) into tables and list of
+        FailedUnit. Pages can be parsed elsewhere, e.g. in a process pool.
+        """
+        tables, failed, outcomes = [], [], []
+        for date, url, result in results:
+            if isinstance(result, BaseException):
+                if not isinstance(result, (FetchError,) + PARSE_ERRORS):
+                    raise result
+                if not isinstance(result, FetchError):
+                    # Cached body (e.g. an error page sent with 200) would
+                    # fail again on retry_failed or the next crawl
+                    self.transport.evict(url)
+                failed.append(FailedUnit(self.bank.bank_id, self.form_type, date, url, result))
+                outcomes.append((date, url, None, repr(result), time.time()))
+                continue
+            numbers, balances, errors = result
+            tables.append((date, numbers, balances))
+            self.unparsed.extend((date, number, cell) for number, cell in errors)
+            if self.journal is not None:
+                outcomes.append((date, url, content_hash(numbers, balances), None, time.time()))
+        if self.journal is not None:
+            self._outcomes = list(self._outcomes) + outcomes
+        return tables, failed
+
+    def _finish(self, tables, failed, merge=False):
+        self.failed = failed
+        if not tables:
+            return self
+        return self._assemble(tables, merge)
+
+    @property
+    def _line_items(self):
+        """Line items of the form, created on first access"""
+        items = self.__dict__.get('_items')
+        if items is None:
+            items = self._items = self._make_items()
+            for position, item in enumerate(items):
+                item._bind(self, position)
+        return items
+
+    def _make_items(self):
+        raise NotImplementedError
+
+    @staticmethod
+    def _parse_page(page):
+        """
+        Returns arrays of item numbers (str) and values (float) and list of
+        (number, cell) for cells which are not numbers.
+        """
+        raise NotImplementedError
+
+    def _pivot(self, tables):
+        """DataFrame of values: reporting dates x item numbers"""
+        values = pd.concat([pd.DataFrame({'date': date, 'number': numbers, 'balance': balances})
+                            for date, numbers, balances in tables])
+        return values.groupby(['date','number'])['balance'].agg('sum').unstack().fillna(0)
+
+    def rollup(self, signed=False):
+        """
+        Totals of every unit of the form's hierarchy for all dates,
+        computed with a single matrix product.
+
+        Parameters
+        ----------
+        signed : bool
+            Subtract liabilities instead of adding them (form 101).
+
+        Returns
+        -------
+        totals : DataFrame
+            dates x unit paths (e.g. 'balance_accounts.Драгоценные_металлы')
+        """
+        totals = self.template.rollup(self.balances, signed)
+        return pd.DataFrame(totals, index=self.date, columns=list(self.template.nodes))
+
+    def _assemble(self, tables, merge=False):
+        values = self._pivot(tables).reindex(columns=self.template.numbers, fill_value=0)
+        dates = values.index.values.astype('datetime64[ns]')
+        values = values.to_numpy(dtype=float)
+
+        if merge and self.is_filled:
+            # New reports replace loaded ones for the same dates
+            keep = ~np.isin(np.asarray(self.date, dtype='datetime64[ns]'), dates)
+            dates = np.concatenate([np.asarray(self.date, dtype='datetime64[ns]')[keep], dates])
+            values = np.concatenate([self._values[keep], values])
+            order = np.argsort(dates, kind='stable')
+            dates, values = dates[order], values[order]
+
+        self.date = dates
+        self._values = np.ascontiguousarray(values)
+        self.is_filled = True
+        return self
+
+
+def _restore(cls, form_type, bank, date, values, failed, unparsed):
+    """Rebuild form pickled by ReportForm.__reduce__"""
+    bank = Bank(*bank)
+    form = cls(bank) if form_type == cls.form_type else cls(bank, form_type=form_type)
+    if values is not None:
+        form.date = date
+        form._values = values
+        form.is_filled = True
+    form.failed = failed
+    form.unparsed = unparsed
+    return form
@@ -1,50 +1,44 @@
-import os
+from ..utils import to_numbers
+from .base import FormNode, LineItem, ReportForm
+from .parsing import ReportPage, filled_rows
+from .templates import get_template
 
-import pandas as pd
-import numpy as np
-import dateparser as dtparser
 
-from urllib.request import urlopen
-from bs4 import BeautifulSoup
-from io import StringIO
-
-from ..utils import to_number
-from .structures import FORM101
-
-
-class Account:
+class Account(LineItem):
     """
     Represents particular sub-ledger account.
     """
-    def __init__(self, number, name, account_type, section, part, balance=0):
+    __slots__ = ('number', 'name', 'account_type', 'section', 'part')
+
+    def __init__(self, number, name, account_type, section, part):
         self.number = number
         self.name = name
         self.account_type = account_type
         self.section = section
         self.part = part
-        self.balance = [balance]
 
     def __repr__(self):
         return "{0} ({1}) - {2}".format(self.number, self.account_type, self.name)
 
 
-class FormUnit:
+class FormUnit(FormNode):
     """
     Represents unit of reporting form's structure.
     Allow access to related accounts.
 
     """
-    def __init__(self, form):
-        self.form = form
-        self.accounts = []
+    @property
+    def accounts(self):
+        """Returns list of accounts in this section or part"""
+        return self._select()
 
     def assets_sum(self):
         """Returns the amount of assets in this unit"""
-        return np.sum([acc.balance for acc in self.assets])
+        return self.balances.dot(self.form.template.assets[self._node.selector]).sum()
 
     def liabilities_sum(self):
         """Returns the amount of liabilities in this unit"""
-        return np.sum([acc.balance for acc in self.liabilities])
+        return self.balances.dot(self.form.template.liabilities[self._node.selector]).sum()
 
     @property
     def assets(self):
@@ -66,102 +60,46 @@ class FormUnit:
         """Returns list of account's names"""
         return [acc.name for acc in self.accounts]
 
-
-    def to_dataframe(self):
-        df = pd.DataFrame([acc.balance for acc in self.accounts]).T
-        df.columns = [acc.number for acc in self.accounts]
-        df['date'] = self.form.date
-        df['bank'] = self.form.bank.bank_id
-        return df
-
-class Form101(FormUnit):
+class Form101(FormUnit, ReportForm):
     """
     Represents whole structure of a reporting form.
 
     """
-    date = None
-    is_filled = False
+    form_type = 'f_101'
+    _unit_class = FormUnit
 
-    def __init__(self, bank):
+    def __init__(self, bank, transport=None):
 
-        self.struct = pd.read_csv(StringIO(FORM101))
+        self.transport = transport or bank.transport
+        self.template = get_template(self.form_type)
+        self.struct = self.template.struct
         self.bank = bank
-        self.accounts = [Account(acc.number, acc.name, acc.account_type, acc.section, acc.part)
-                             for acc in self.struct.itertuples(index=False)]
-
-        for s in self.struct.section.unique():
-            section = FormUnit(self)
-            for p in self.struct.part.unique():
-                part = FormUnit(self)
-                part.accounts = [acc for acc in self.accounts if acc.part == p]
-                setattr(section, p, part)
-                section.accounts.extend(part.accounts)
-            setattr(self, s, section)
-        self.form = self
-
-    def fill(self, first_n=None):
-        """
-        Fill an empty initialized form with values. Load first n forms from
-        cbr.ru site (2016->2015->...)
-
-        """
-        soup, f_101 = self.bank._find_form('f_101')
-
-        if not f_101:
-            return pd.DataFrame()
-
-        # Get list of reporting dates
-        dates = []
-        for el in f_101.find('div',{'class':'switched'}).findAll('div',{'class':'normal'}):
-            year = el['id'][-4:]
-            dates.extend([dtparser.parse(a.text[3:] + ' ' + year) for a in el.findAll('a')])
-
-        urls = [('http://www.cbr.ru/credit/'+a['href']) for a in f_101.findAll('a')]
-
-        if not first_n or first_n > len(urls):
-            first_n = len(urls)
-
-        f_101 = pd.DataFrame()
-
-        for url, date in zip(urls[:first_n], dates):
-            page = urlopen(url).read()
-            soup = BeautifulSoup(page,'html.parser')
-
-            table = pd.read_html(page)[1]
-            # For two case of form view
-            if 'Код' in soup.find('h2').text:
-
-                table = table.dropna()
-                table = table.drop([3], axis=0)
-                table.index = table[0]
-                table = table[[12]]
-                table.columns = ['balance']
-                table['date'] = date
-                table.rename(index={12:'number'}, inplace=True)
-
-            elif 'Форма' in soup.find('h2').text:
-
-                table = table.drop([0,1,2], axis=0).fillna(0)
-                table[2] = table[2].map(to_number) + table[3].map(to_number)
-                table.index = table[1]
-                table = table[[2]]
-                table.columns = ['balance']
-                table['date'] = date
-                table.rename(index={0:'number'}, inplace=True)
-
-            f_101 = pd.concat([f_101, table])
-
-        f_101 = f_101.reset_index()
-        f_101.columns = ['number', 'balance','date']
-        f_101.balance = f_101.balance.map(to_number)
-        f_101 = f_101.groupby(['date','number'])['balance'].agg('sum').unstack().reset_index().fillna(0)
-        f_101['index'] = self.bank.bank_id
-
-        self.date = f_101.date.values
-        for acc in self.accounts:
-            try:
-                acc.balance = f_101[str(acc.number)].values
-            except KeyError:
-                acc.balance = np.zeros(first_n)
-        self.is_filled = True
-        return self
+        FormUnit.__init__(self, self, self.template.root)
+
+    def _make_items(self):
+        return [Account(number, name, account_type, section, part)
+                for number, name, section, part, account_type in self.template.records]
+
+    @staticmethod
+    def _parse_page(page):
+        report = ReportPage(page)
+        header = report.header
+        table = report.table(1)
+
+        errors = []
+        # For two case of form view
+        if 'Код' in header:
+            rows = filled_rows(table)
+            rows[3] = False
+            numbers = table[rows, 0]
+            balances = to_numbers(table[rows, 12], errors)
+
+        elif 'Форма' in header:
+            numbers = table[3:, 1]
+            balances = to_numbers(table[3:, 2], errors)
+            balances += to_numbers(table[3:, 3], errors)
+
+        else:
+            raise ValueError('Unknown layout of form 101')
+
+        return numbers, balances, [(numbers[i], value) for i, value in errors]
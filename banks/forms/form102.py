@@ -1,43 +1,37 @@
-import os
+from ..utils import to_numbers
+from .base import FormNode, LineItem, ReportForm
+from .parsing import ReportPage, filled_rows
+from .templates import get_template
 
-import pandas as pd
-import numpy as np
-import dateparser as dtparser
 
-from urllib.request import urlopen
-from bs4 import BeautifulSoup
-from io import StringIO
-
-from ..utils import to_number
-from .structures import FORM102
-
-
-class Symbol:
+class Symbol(LineItem):
     """
     Represents particular symbol.
     """
-    def __init__(self, number, name, chaper,part,section,subsection, balance=0):
+    __slots__ = ('number', 'name', 'chaper', 'part', 'section', 'subsection')
+
+    def __init__(self, number, name, chaper,part,section,subsection):
         self.number = number
         self.name = name
         self.chaper = chaper
         self.subsection = subsection
         self.section = section
         self.part = part
-        self.balance = [balance]
 
     def __repr__(self):
         return "({0}) - {1}".format(self.number, self.name)
 
 
-class FormUnit:
+class FormUnit(FormNode):
     """
     Represents unit of reporting form's structure.
     Allow access to related symbols.
 
     """
-    def __init__(self, form):
-        self.form = form
-        self.symbols = []
+    @property
+    def symbols(self):
+        """Returns list of symbols in this unit"""
+        return self._select()
 
     @property
     def symbols_numbers(self):
@@ -51,113 +45,44 @@ class FormUnit:
 
     def sum(self):
         """Return sum of all symbols in this unit"""
-        return np.sum([s.balance for s in self.symbols])
-
-    def to_dataframe(self):
-        df = pd.DataFrame([acc.balance for acc in self.symbols]).T
-        df.columns = [acc.number for acc in self.symbols]
-        df['date'] = self.form.date
-        df['bank'] = self.form.bank.bank_id
-        return df
+        return self.balances.sum()
 
-class Form102(FormUnit):
+class Form102(FormUnit, ReportForm):
     """
     Represents whole structure of a reporting form.
 
     Can store data for multiple dates
 
     """
-    date = None
-    is_filled = False
+    form_type = 'f_102'
+    _unit_class = FormUnit
 
-    def __init__(self, bank):
+    def __init__(self, bank, transport=None):
 
-        self.struct = pd.read_csv(StringIO(FORM102)).fillna('Далее')
+        self.transport = transport or bank.transport
+        self.template = get_template(self.form_type)
+        self.struct = self.template.struct
         self.bank = bank
-        self.symbols = [Symbol(acc.number, acc.name, acc.chapter,
-                               acc.part, acc.section, acc.subsection)
-                             for acc in self.struct.itertuples(index=False)]
-        for ch in self.struct.chapter.unique():
-            chapter = FormUnit(self)
-            for p in self.struct.query('chapter == @ch').part.unique():
-                part = FormUnit(self)
-                for s in self.struct.query('part == @p').section.unique():
-                    section = FormUnit(self)
-                    for ss in self.struct.query('section == @s').subsection.unique():
-                        subsection = FormUnit(self)
-                        subsection.symbols = [acc for acc in self.symbols if acc.subsection == ss]
-                        setattr(section, ss, subsection)
-                        section.symbols.extend(subsection.symbols)
-                    setattr(part, s, section)
-                    part.symbols.extend(section.symbols)
-                setattr(chapter, p, part)
-                chapter.symbols.extend(part.symbols)
-            setattr(self, ch, chapter)
-
-        self.form = self
-
-
-    def fill(self, first_n=None):
-        """
-        Fill an empty initialized form with values. Load first n forms from
-        cbr.ru site (2016->2015->...)
-
-        """
-        soup = self.bank._open_bank_page()
-
-        reports =  soup.find('div' , {'class':'reports'})
-        f_102 = reports.find('div', {'id':'f_102'})
-
-        if not f_102:
-            return pd.DataFrame()
-
-        # Get list of reporting dates
-        dates = []
-        for el in f_102.find('div',{'class':'switched'}).findAll('div',{'class':'normal'}):
-            year = el['id'][-4:]
-            dates.extend([dtparser.parse(a.text[3:] + ' ' + year)
-                          for a in el.findAll('a')])
-
-
-        f_102 = f_102.findAll('a')
-
-        urls = [('http://www.cbr.ru/credit/'+a['href']) for a in f_102]
-
-        if not first_n or first_n > len(urls):
-            first_n = len(urls)
-        f_102 = pd.DataFrame()
-
-        for url, date in zip(urls[:first_n], dates[:first_n]):
-            page = urlopen(url).read()
-            soup = BeautifulSoup(page,'html.parser')
-
-            table = pd.read_html(page)[1]
-
-            if len(table.columns) > 3:
-                table = table[[2,5]].dropna()
-                table = table.drop(2)
-                table.columns = ['symbol', 'balance']
-            elif len(table.columns) == 3:
-                table = table[[1,2]].dropna()
-                table = table.drop(0)
-                table.columns = ['symbol', 'balance']
-
-            table['date'] = date
-            f_102 = pd.concat([f_102, table])
-
-        f_102.columns = ['symbol', 'balance','date']
-
-        f_102.balance = f_102.balance.map(to_number)
-
-        f_102 = f_102.groupby(['date','symbol'])['balance'].agg('sum').unstack().reset_index().fillna(0)
-        f_102['index'] = self.bank.bank_id
-
-
-        self.date = f_102.date.values
-        for acc in self.symbols:
-            try:
-                acc.balance = f_102[str(acc.number)].values
-            except KeyError:
-                acc.balance = np.zeros(first_n)
-        self.is_filled = True
-        return self
+        FormUnit.__init__(self, self, self.template.root)
+
+    def _make_items(self):
+        return [Symbol(number, name, chapter, part, section, subsection)
+                for name, number, chapter, part, section, subsection in self.template.records]
+
+    @staticmethod
+    def _parse_page(page):
+        table = ReportPage(page).table(1)
+
+        if table.shape[1] > 3:
+            columns, header = [2,5], 2
+        elif table.shape[1] == 3:
+            columns, header = [1,2], 0
+        else:
+            raise ValueError('Unknown layout of form 102')
+
+        rows = filled_rows(table, columns)
+        rows[header] = False
+        numbers = table[rows, columns[0]]
+        errors = []
+        balances = to_numbers(table[rows, columns[1]], errors)
+        return numbers, balances, [(numbers[i], value) for i, value in errors]
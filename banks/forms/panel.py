@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+
+from .templates import get_template
+
+
+class FormPanel:
+    """
+    Filled forms of one kind for many banks.
+
+    Logically a 3-D array banks x dates x line items. Only (bank, date)
+    pairs which were reported are stored: a 2-D array of rows with bank and
+    date coordinates of every row, so missing periods of closed or young
+    banks take no memory. Dense array is built on demand by `values`.
+
+    Hierarchy units are available as attributes, the same way as for a
+    single form: `panel.balance_accounts.Драгоценные_металлы` is a panel
+    with the accounts of this part only.
+
+    Parameters
+    ----------
+    template : FormTemplate
+    banks : array-like
+        Bank ids.
+    dates : array-like
+        Reporting dates, sorted.
+    rows : np.ndarray
+        Balances, one row for every stored (bank, date) pair.
+    bank_index, date_index : np.ndarray of int
+        Positions in banks and dates of every row.
+    positions : np.ndarray of int
+        Positions of the panel's line items in the template. All if None.
+    node : TemplateNode
+        Hierarchy node of the panel's items, gives access to child units.
+    """
+
+    def __init__(self, template, banks, dates, rows, bank_index, date_index,
+                 positions=None, node=None):
+        self.template = template
+        self.banks = np.asarray(banks, dtype=object)
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.rows = rows
+        self.bank_index = np.asarray(bank_index, dtype=np.intp)
+        self.date_index = np.asarray(date_index, dtype=np.intp)
+        if positions is None:
+            positions = np.arange(len(template))
+            node = template.root
+        self.positions = positions
+        self._node = node
+
+    @classmethod
+    def from_forms(cls, forms, dtype=float):
+        """
+        Stack filled forms of one type.
+
+        Not filled forms (and empty DataFrames returned for banks without the
+        form) are skipped. ValueError is raised if a report of a bank for
+        the same date is in several forms.
+
+        Parameters
+        ----------
+        forms : list
+            Filled Form101, Form102, ... of the same form type.
+        dtype : numpy dtype
+            Type of stored balances, float32 halves the memory.
+        """
+        forms = [f for f in forms if getattr(f, 'is_filled', False)]
+        if not forms:
+            raise ValueError('No filled forms')
+        form_types = set(f.form_type for f in forms)
+        if len(form_types) > 1:
+            raise ValueError('Forms of different types: %s' % ', '.join(sorted(form_types)))
+
+        banks = pd.unique(np.array([f.bank.bank_id for f in forms], dtype=object))
+        dates = np.unique(np.concatenate([np.asarray(f.date, dtype='datetime64[ns]') for f in forms]))
+        bank_positions = {bank: i for i, bank in enumerate(banks)}
+
+        rows = np.concatenate([f._values for f in forms]).astype(dtype, copy=False)
+        bank_index = np.concatenate([np.full(len(f.date), bank_positions[f.bank.bank_id])
+                                     for f in forms])
+        date_index = np.searchsorted(dates, np.concatenate(
+            [np.asarray(f.date, dtype='datetime64[ns]') for f in forms]))
+
+        cells = bank_index * len(dates) + date_index
+        unique, counts = np.unique(cells, return_counts=True)
+        if (counts > 1).any():
+            bank, date = divmod(unique[counts > 1][0], len(dates))
+            raise ValueError('Several forms of bank %s for %s' % (
+                banks[bank], str(dates[date])[:10]))
+        return cls(get_template(forms[0].form_type), banks, dates, rows, bank_index, date_index)
+
+    def __repr__(self):
+        return 'FormPanel(%s, %d banks x %d dates x %d items, %d rows)' % (
+            self.template.form_type, len(self.banks), len(self.dates),
+            len(self.positions), len(self.rows))
+
+    @property
+    def shape(self):
+        return len(self.banks), len(self.dates), len(self.positions)
+
+    @property
+    def numbers(self):
+        """Numbers of the panel's line items"""
+        return self.template.numbers[self.positions]
+
+    @property
+    def values(self):
+        """Dense 3-D array banks x dates x items, NaN for not reported dates"""
+        values = np.full(self.shape, np.nan, dtype=self.rows.dtype)
+        values[self.bank_index, self.date_index] = self.rows
+        return values
+
+    def _replace(self, rows=None, bank_index=None, date_index=None, banks=None, dates=None,
+                 positions=None, node=None):
+        return FormPanel(
+            self.template,
+            self.banks if banks is None else banks,
+            self.dates if dates is None else dates,
+            self.rows if rows is None else rows,
+            self.bank_index if bank_index is None else bank_index,
+            self.date_index if date_index is None else date_index,
+            self.positions if positions is None else positions,
+            node)
+
+    def __getattr__(self, name):
+        node = self.__dict__.get('_node')
+        if node is None or name not in node.children:
+            raise AttributeError("'FormPanel' object has no attribute '%s'" % name)
+        child = node.children[name]
+        columns = np.searchsorted(self.positions, child.index)
+        if len(columns) and columns[-1] - columns[0] == len(columns) - 1:
+            # Contiguous columns: slice of the rows is a view, not a copy
+            columns = slice(columns[0], columns[-1] + 1)
+        return self._replace(rows=self.rows[:, columns], positions=child.index, node=child)
+
+    def __dir__(self):
+        children = list(self._node.children) if self._node is not None else []
+        return list(super().__dir__()) + children
+
+    def sel(self, banks=None, dates=None, items=None):
+        """
+        Select part of the panel by any axis.
+
+        Parameters
+        ----------
+        banks : list
+            Bank ids.
+        dates : list
+            Reporting dates (anything accepted by pd.to_datetime).
+        items : list of str
+            Numbers of line items.
+        """
+        panel = self
+        if banks is not None:
+            keep = np.flatnonzero(pd.Index(panel.banks).isin(list(banks)))
+            panel = panel._take_rows(panel.bank_index, keep, 'banks')
+        if dates is not None:
+            wanted = pd.to_datetime(list(dates)).values.astype('datetime64[ns]')
+            keep = np.flatnonzero(np.isin(panel.dates, wanted))
+            panel = panel._take_rows(panel.date_index, keep, 'dates')
+        if items is not None:
+            positions = np.sort([self.template.positions[str(n)] for n in items])
+            columns = np.searchsorted(panel.positions, positions)
+            if not np.array_equal(panel.positions[np.minimum(columns, len(panel.positions) - 1)],
+                                  positions):
+                raise KeyError('Items are not in the panel')
+            panel = panel._replace(rows=panel.rows[:, columns], positions=positions)
+        return panel
+
+    def _take_rows(self, coordinate, keep, axis):
+        """Keep rows whose coordinate on the axis is in keep, renumber the axis"""
+        renumber = np.full(len(getattr(self, axis)), -1)
+        renumber[keep] = np.arange(len(keep))
+        mask = renumber[coordinate] >= 0
+        new = {axis: getattr(self, axis)[keep], 'rows': self.rows[mask],
+               'bank_index': self.bank_index[mask], 'date_index': self.date_index[mask]}
+        new['bank_index' if axis == 'banks' else 'date_index'] = renumber[coordinate[mask]]
+        return self._replace(node=self._node, **new)
+
+    def _row_index(self):
+        return pd.MultiIndex.from_arrays(
+            [self.banks[self.bank_index], self.dates[self.date_index]], names=['bank', 'date'])
+
+    def rollup(self, signed=False):
+        """
+        Totals of hierarchy units for every bank and date with a single
+        matrix product.
+
+        Returns
+        -------
+        totals : DataFrame
+            (bank, date) x unit paths
+        """
+        matrix = self.template.signed_rollup_matrix if signed else self.template.rollup_matrix
+        totals = self.rows @ matrix[self.positions]
+        return pd.DataFrame(totals, index=self._row_index(), columns=list(self.template.nodes))
+
+    def to_dataframe(self):
+        """Wide DataFrame like concatenated Form.to_dataframe() of all banks"""
+        numbers = self.template.struct.number.values[self.positions]
+        df = pd.DataFrame(self.rows, columns=numbers)
+        df['date'] = self.dates[self.date_index]
+        df['bank'] = self.banks[self.bank_index]
+        return df
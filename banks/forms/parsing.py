@@ -0,0 +1,208 @@
+import re
+
+import numpy as np
+
+from lxml import etree, html as lxml_html
+
+_WHITESPACE = re.compile(r'[\r\n]+|\s{2,}')
+_CHARSET = re.compile(rb'charset=["\']?([\w-]+)', re.I)
+# Tables with any text, the same selection as in pandas.read_html
+_TABLES = "//table//*[re:test(text(), '.+')]/ancestor::table"
+_REGEXP = {'re': 'http://exslt.org/regular-expressions'}
+
+
+def _encoding(page):
+    """Declared encoding of the page, utf-8 or cp1251 (cbr.ru default) otherwise"""
+    declared = _CHARSET.search(page[:4096])
+    if declared:
+        return declared.group(1).decode('ascii')
+    try:
+        page.decode('utf8')
+    except UnicodeDecodeError:
+        return 'cp1251'
+    return 'utf8'
+
+
+def _clean(text):
+    """Collapse whitespace the same way as pandas.read_html"""
+    return _WHITESPACE.sub(' ', text.strip())
+
+
+def _span(cell, name):
+    try:
+        return int(cell.get(name) or 1)
+    except ValueError:
+        return 1
+
+
+def _hidden(element):
+    return 'display:none' in element.get('style', '').replace(' ', '')
+
+
+def _cells(row):
+    return row.xpath('./td | ./th')
+
+
+class ReportPage:
+    """
+    Report page parsed once with lxml.
+
+    Tables are numbered and split into rows exactly as in pandas.read_html
+    (lxml flavor): only displayed tables containing text are counted,
+    header rows (<thead> or leading rows of <th> cells) are not a part of
+    the table, colspan/rowspan are expanded and short rows are padded with
+    empty strings. So row and column positions are the same as in
+    DataFrames returned by read_html.
+
+    Parameters
+    ----------
+    page : bytes
+        Body of the page.
+
+    Raises
+    ------
+    ValueError
+        The page is empty or is not HTML.
+    """
+
+    def __init__(self, page):
+        parser = lxml_html.HTMLParser(encoding=_encoding(page))
+        try:
+            self.doc = lxml_html.document_fromstring(page, parser=parser)
+        except etree.LxmlError as e:
+            # lxml errors can not be pickled (e.g. back from a parse process)
+            raise ValueError('Page is not parsed: %s' % e) from None
+        for br in self.doc.xpath('*//br'):
+            br.tail = '\n' + (br.tail or '')
+        self._tables = [t for t in self.doc.xpath(_TABLES, namespaces=_REGEXP)
+                        if not _hidden(t)]
+        self._frames = []
+        for table in self._tables:
+            for element in table.xpath('.//*[@style]'):
+                if _hidden(element):
+                    element.getparent().remove(element)
+
+    @property
+    def header(self):
+        """Text of the first h2 element"""
+        h2 = self.doc.find('.//h2')
+        if h2 is None:
+            raise ValueError('Report header not found')
+        return h2.text_content()
+
+    def _table(self, i):
+        """i-th table not skipped by read_html and its data rows"""
+        while len(self._frames) <= i:
+            if not self._tables:
+                raise ValueError('Table %d not found' % i)
+            table = self._tables.pop(0)
+            rows = self._rows(table)
+            if rows is not None:
+                self._frames.append((table,) + rows)
+        return self._frames[i]
+
+    def table(self, i):
+        """Returns body of i-th table as 2-D array of str"""
+        rows, width = self._table(i)[1:]
+        array = np.full((len(rows), width), '', dtype=object)
+        for n, row in enumerate(rows):
+            array[n] = row
+        return array
+
+    def _rows(self, table):
+        """(data rows, width) of the table as read_html sees them, None for empty table"""
+        head = table.xpath('.//thead/tr')
+        for thead in table.xpath('.//thead'):
+            # Cells right in <thead> without <tr>
+            if _cells(thead):
+                head.append(thead)
+        body = table.xpath('.//tbody//tr') + table.xpath('./tr')
+        foot = table.xpath('.//tfoot//tr')
+        if not head:
+            while body and all(cell.tag == 'th' for cell in _cells(body[0])):
+                head.append(body.pop(0))
+
+        head, body, foot = self._expand(head), self._expand(body), self._expand(foot)
+        rows = head + body + foot
+        width = max((len(r) for r in rows), default=0)
+        # Short rows are padded, blank lines (possible only in one column)
+        # are skipped by the parser
+        rows = [r + [''] * (width - len(r)) for r in rows
+                if width > 1 or (width == 1 and r and r[0].strip())]
+        if not rows:
+            return None
+
+        # Header is the single head row or all up to the last not empty one
+        if len(head) == 1:
+            return rows[1:], width
+        filled = [n for n, row in enumerate(head) if any(row)]
+        return (rows[filled[-1] + 1:] if filled else rows), width
+
+    @staticmethod
+    def _expand(rows):
+        """Cell texts of rows with colspan and rowspan expanded"""
+        texts = []
+        remainder = []  # cells spanning next rows: (column, text, rows left)
+        for tr in rows:
+            row, next_remainder, column = [], [], 0
+            for cell in _cells(tr):
+                while remainder and remainder[0][0] <= column:
+                    prev_column, prev_text, left = remainder.pop(0)
+                    row.append(prev_text)
+                    if left > 1:
+                        next_remainder.append((prev_column, prev_text, left - 1))
+                    column += 1
+                text = _clean(cell.text_content())
+                rowspan = _span(cell, 'rowspan')
+                for _ in range(_span(cell, 'colspan')):
+                    row.append(text)
+                    if rowspan > 1:
+                        next_remainder.append((column, text, rowspan - 1))
+                    column += 1
+            for prev_column, prev_text, left in remainder:
+                row.append(prev_text)
+                if left > 1:
+                    next_remainder.append((prev_column, prev_text, left - 1))
+            texts.append(row)
+            remainder = next_remainder
+        while remainder:
+            row, next_remainder = [], []
+            for prev_column, prev_text, left in remainder:
+                row.append(prev_text)
+                if left > 1:
+                    next_remainder.append((prev_column, prev_text, left - 1))
+            texts.append(row)
+            remainder = next_remainder
+        return texts
+
+    def records(self, i):
+        """
+        Yields (cell texts, href of the first link or None) of i-th table's
+        rows with td cells, header rows of th cells are skipped.
+        """
+        for tr in self._table(i)[0].xpath('./tr | ./tbody/tr'):
+            cells = tr.xpath('./td')
+            if not cells:
+                continue
+            link = tr.find('.//a')
+            yield ([_clean(cell.text_content()) for cell in cells],
+                   link.get('href') if link is not None else None)
+
+    def hrefs(self):
+        """Targets of all links of the page"""
+        return [a.get('href') for a in self.doc.iter('a') if a.get('href')]
+
+    def list_items(self, *classes):
+        """Texts of li elements of the first ul having all given classes"""
+        classes = set(classes)
+        for ul in self.doc.iter('ul'):
+            if classes <= set((ul.get('class') or '').split()):
+                return [li.text_content() for li in ul.iter('li')]
+        raise ValueError('List %s not found' % ' '.join(sorted(classes)))
+
+
+def filled_rows(table, columns=None):
+    """Mask of rows without empty cells (in given columns), like DataFrame.dropna"""
+    if columns is not None:
+        table = table[:, columns]
+    return (table != '').all(axis=1)
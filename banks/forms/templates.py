@@ -0,0 +1,173 @@
+import sys
+
+from io import StringIO
+from types import MappingProxyType
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .structures import FORM101, FORM102, FORM123, FORM134, FORM135
+
+# Node of form's hierarchy: positions of its line items, the same positions
+# as a slice when they are contiguous (to get views, not copies, of the
+# form's storage) and child nodes by name
+TemplateNode = namedtuple('TemplateNode', ['index', 'selector', 'children'])
+
+
+def _frozen(array):
+    array = np.asarray(array)
+    array.setflags(write=False)
+    return array
+
+
+def _node(index, children=None):
+    index = _frozen(np.asarray(index, dtype=np.intp))
+    selector = index
+    if len(index) and index[-1] - index[0] == len(index) - 1 and (np.diff(index) == 1).all():
+        selector = slice(int(index[0]), int(index[-1]) + 1)
+    return TemplateNode(index, selector, MappingProxyType(children or {}))
+
+
+def _grouped_hierarchy(struct, levels):
+    """
+    Tree where every level groups line items of its parent by the level's
+    column. Built in a single pass over rows, children keep order of
+    the first appearance.
+    """
+    root = ([], {})
+    for i, path in enumerate(zip(*(struct[level].values for level in levels))):
+        node = root
+        node[0].append(i)
+        for name in path:
+            children = node[1]
+            if name not in children:
+                children[name] = ([], {})
+            node = children[name]
+            node[0].append(i)
+
+    def freeze(node):
+        index, children = node
+        return _node(index, {name: freeze(child) for name, child in children.items()})
+    return freeze(root)
+
+
+class FormTemplate:
+    """
+    Immutable structure of a reporting form.
+
+    Parsed once per process (see get_template) and shared by all form
+    instances, which only keep references to it.
+
+    Attributes
+    ----------
+    form_type : str
+        Id of the form (f_101, f_102, ...).
+    struct : DataFrame
+        Parsed structure. Shared, must not be modified.
+    numbers : np.ndarray of str
+        Numbers of line items as they appear in reports.
+    records : tuple
+        Line items' rows of struct as tuples.
+    root : TemplateNode
+        Hierarchy of the form.
+    assets, liabilities : np.ndarray of bool
+        Masks of assets and liabilities accounts (form 101 only).
+    nodes : tuple of str
+        Paths of all hierarchy nodes except the root, e.g.
+        'balance_accounts.Драгоценные_металлы'.
+    rollup_matrix : np.ndarray
+        Line items x nodes matrix with 1 where the item belongs to the node.
+    signed_rollup_matrix : np.ndarray
+        The same with -1 for liabilities accounts (equal to rollup_matrix
+        for forms without account types).
+    """
+
+    def __init__(self, form_type, struct, root):
+        self.form_type = form_type
+        self.struct = struct
+        self.numbers = _frozen(struct.number.astype(str).values)
+        # Sections, parts and account types repeat for hundreds of items,
+        # interned they are shared by all items of all forms
+        self.records = tuple(tuple(sys.intern(v) if isinstance(v, str) else v for v in record)
+                             for record in struct.itertuples(index=False, name=None))
+        self.root = root
+        self.positions = MappingProxyType({n: i for i, n in enumerate(self.numbers)})
+        if 'account_type' in struct:
+            self.assets = _frozen(struct.account_type.values == 'А')
+            self.liabilities = _frozen(struct.account_type.values == 'П')
+
+        nodes = []
+        def walk(node, path):
+            for name, child in node.children.items():
+                nodes.append(('.'.join(path + (name,)), child.index))
+                walk(child, path + (name,))
+        walk(root, ())
+        # Hierarchy is small (hundreds of items and nodes), so the matrix is
+        # dense: the product is a single BLAS call without extra dependencies
+        matrix = np.zeros((len(self.numbers), len(nodes)))
+        for column, (_, index) in enumerate(nodes):
+            matrix[index, column] = 1
+        self.nodes = tuple(path for path, _ in nodes)
+        self.rollup_matrix = _frozen(matrix)
+        if 'account_type' in struct:
+            signed = matrix.copy()
+            signed[self.liabilities] *= -1
+            self.signed_rollup_matrix = _frozen(signed)
+        else:
+            self.signed_rollup_matrix = self.rollup_matrix
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def rollup(self, values, signed=False):
+        """
+        Totals of all hierarchy nodes.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            Balances with line items on the last axis: dates x items for one
+            bank, banks x dates x items for a stack of banks.
+        signed : bool
+            Subtract liabilities instead of adding them (form 101).
+
+        Returns
+        -------
+        totals : np.ndarray
+            The same shape with nodes (see `nodes`) on the last axis.
+        """
+        matrix = self.signed_rollup_matrix if signed else self.rollup_matrix
+        return np.asarray(values) @ matrix
+
+    def __repr__(self):
+        return 'FormTemplate(%s, %d items)' % (self.form_type, len(self))
+
+    def __setattr__(self, name, value):
+        if name in self.__dict__:
+            raise AttributeError('FormTemplate is immutable')
+        super().__setattr__(name, value)
+
+
+@lru_cache(maxsize=None)
+def get_template(form_type):
+    """Returns shared template of the form, parsing its structure on first call"""
+    if form_type == 'f_101':
+        struct = pd.read_csv(StringIO(FORM101))
+        root = _grouped_hierarchy(struct, ['section', 'part'])
+    elif form_type == 'f_102':
+        struct = pd.read_csv(StringIO(FORM102)).fillna('Далее')
+        root = _grouped_hierarchy(struct, ['chapter', 'part', 'section', 'subsection'])
+    elif form_type == 'f_123':
+        struct = pd.read_csv(StringIO(FORM123))
+        root = _node(np.arange(len(struct)))
+    elif form_type == 'f_134':
+        struct = pd.read_csv(StringIO(FORM134))
+        root = _node(np.arange(len(struct)))
+    elif form_type == 'f_135':
+        struct = pd.read_csv(StringIO(FORM135))
+        root = _grouped_hierarchy(struct, ['name'])
+    else:
+        raise ValueError('Unknown form type: %s' % form_type)
+    return FormTemplate(form_type, struct, root)
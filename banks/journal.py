@@ -0,0 +1,223 @@
+# journal.py
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    bank_id TEXT NOT NULL,
+    form_type TEXT NOT NULL,
+    date TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    content_hash TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    started REAL,
+    finished REAL,
+    elapsed REAL,
+    PRIMARY KEY (bank_id, form_type, date)
+);
+CREATE INDEX IF NOT EXISTS units_status ON units (status);
+"""
+
+# Statuses of work units
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def content_hash(numbers, balances):
+    """Hash of a parsed report, equal for equal reports whatever the page markup"""
+    digest = hashlib.sha1()
+    digest.update('\n'.join(map(str, numbers)).encode('utf8'))
+    digest.update(np.ascontiguousarray(balances, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def save(forms, store):
+    """Write filled forms of any types to FormStore"""
+    filled = {}
+    for form in forms:
+        if form.is_filled:
+            filled.setdefault(form.form_type, []).append(form)
+    for group in filled.values():
+        store.write(group)
+
+
+def _date_key(date):
+    return str(np.datetime64(date, 'D'))
+
+
+class CrawlJournal:
+    """
+    SQLite journal of crawl's work units - one report of one bank.
+
+    A unit is marked running with attempts incremented when its report is
+    requested. It is marked done (with hash of the content) or failed only
+    when the form is committed, i.e. after its data is saved. An interrupted
+    crawl started again skips done units and loads only the rest.
+
+    Forms consult the journal given in their `journal` attribute, see
+    BankScraper.load_forms(journal=...).
+
+    Parameters
+    ----------
+    path : str
+        Database file, created if it does not exist.
+    max_attempts : int
+        Units failed this many times are not requested again. Unlimited
+        if None.
+    """
+
+    def __init__(self, path, max_attempts=None):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        state['_connection'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        # sqlite connection must not be shared with forked processes
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+    def start(self, form, links):
+        """
+        Select links of the form which are not done yet and mark them running.
+
+        Returns
+        -------
+        links : list of (date, url)
+        """
+        bank_id, form_type = str(form.bank.bank_id), form.form_type
+        with self._lock, self.connection as db:
+            rows = db.execute('SELECT date, status, attempts FROM units '
+                              'WHERE bank_id = ? AND form_type = ?', (bank_id, form_type))
+            known = {date: (status, attempts) for date, status, attempts in rows}
+
+            def pending(date):
+                status, attempts = known.get(_date_key(date), (None, 0))
+                if status == DONE:
+                    return False
+                return not (status == FAILED and self.max_attempts is not None and
+                            attempts >= self.max_attempts)
+
+            links = [(date, url) for date, url in links if pending(date)]
+            now = time.time()
+            db.executemany(
+                'INSERT INTO units (bank_id, form_type, date, url, status, attempts, started) '
+                'VALUES (?, ?, ?, ?, ?, 1, ?) '
+                'ON CONFLICT (bank_id, form_type, date) DO UPDATE SET '
+                'url = excluded.url, status = excluded.status, attempts = attempts + 1, '
+                'started = excluded.started, finished = NULL, elapsed = NULL',
+                [(bank_id, form_type, _date_key(date), url, RUNNING, now) for date, url in links])
+        return links
+
+    def commit(self, forms, store=None):
+        """
+        Record outcomes of loaded forms, writing them to the store first.
+
+        Parameters
+        ----------
+        forms : list
+            Forms filled with this journal.
+        store : FormStore
+            Data of done units is saved there. Without a store the caller
+            is responsible to save the forms before committing.
+        """
+        if store is not None:
+            save(forms, store)
+
+        records = []
+        for form in forms:
+            bank_id = str(form.bank.bank_id)
+            for date, url, digest, error, finished in form._outcomes:
+                records.append((FAILED if error else DONE, digest, error, finished, finished,
+                                bank_id, form.form_type, _date_key(date)))
+            form._outcomes = []
+        with self._lock, self.connection as db:
+            db.executemany('UPDATE units SET status = ?, content_hash = ?, error = ?, '
+                           'finished = ?, elapsed = ? - started '
+                           'WHERE bank_id = ? AND form_type = ? AND date = ?', records)
+
+    def units(self, status=None):
+        """Work units as DataFrame, all or with given status"""
+        query = 'SELECT * FROM units'
+        params = ()
+        if status is not None:
+            query += ' WHERE status = ?'
+            params = (status,)
+        with self._lock:
+            df = pd.read_sql_query(query, self.connection, params=params)
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def summary(self):
+        """Number of units by form and status"""
+        with self._lock:
+            return pd.read_sql_query(
+                'SELECT form_type, status, COUNT(*) AS units, SUM(attempts) AS attempts '
+                'FROM units GROUP BY form_type, status', self.connection)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class Checkpoint:
+    """
+    Saves forms in batches while a crawl goes on, so an interruption loses
+    at most one batch.
+
+    Parameters
+    ----------
+    journal : CrawlJournal
+        Outcomes of the forms are committed to it. Forms are only written
+        to the store if None.
+    store : FormStore
+        Required with a journal: units are marked done only when their data
+        is saved, otherwise they would be skipped by the next crawl.
+    every : int
+        Number of forms in a batch.
+    """
+
+    def __init__(self, journal=None, store=None, every=100):
+        if journal is not None and store is None:
+            raise ValueError('CrawlJournal requires a FormStore to save the data')
+        self.journal = journal
+        self.store = store
+        self.every = every
+        self._forms = []
+
+    def add(self, form):
+        self._forms.append(form)
+        if len(self._forms) >= self.every:
+            self.flush()
+
+    def flush(self):
+        forms, self._forms = self._forms, []
+        if self.journal is not None:
+            self.journal.commit(forms, self.store)
+        elif self.store is not None:
+            save(forms, self.store)
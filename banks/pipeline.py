@@ -0,0 +1,236 @@
+# pipeline.py
+import queue
+import threading
+import multiprocessing
+
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from .bank import BANK_PAGE_URL_PATTERN
+from .exceptions import FetchError
+from .forms.base import FailedUnit
+
+# End of stream marker passed between stages
+_DONE = object()
+
+
+def _parse_context():
+    """
+    Parse processes are started while I/O threads hold locks (transport,
+    journal), forked children could inherit them locked.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+class Pipeline:
+    """
+    Staged loader of forms: fetch -> parse -> assemble.
+
+    Report pages are downloaded by I/O threads, parsed in a pool of
+    processes (lxml and numpy conversion hold the GIL, so parsing does not
+    scale with threads) and assembled into forms in the calling thread.
+    Stages are connected by bounded queues: when parsing falls behind,
+    downloading waits instead of piling pages up in memory. Parse processes
+    receive only bytes of pages and return compact arrays.
+
+    Parameters
+    ----------
+    io_workers : int
+        Number of downloading threads. Connection pools of the forms'
+        transports are extended to this size.
+    parse_workers : int
+        Number of parsing processes, cpu count if None. With 0 pages are
+        parsed in a thread of the pipeline. Processes are started fresh
+        (forkserver or spawn), so a script using them needs the
+        `if __name__ == '__main__':` guard.
+    queue_size : int
+        Max number of pages waiting for every stage.
+    """
+
+    def __init__(self, io_workers=32, parse_workers=None, queue_size=64):
+        self.io_workers = io_workers
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+
+    def run(self, forms, first_n=None, dates=None, since=None, until=None, update=False,
+            callback=None):
+        """
+        Fill forms of any types and banks.
+
+        Parameters
+        ----------
+        forms : list
+            Initialized forms (Form101(bank), ...).
+        first_n, dates, since, until, update :
+            See ReportForm.fill.
+        callback : callable
+            Called with every form as soon as it is filled.
+
+        Returns
+        -------
+        failed : list of FailedUnit
+            Reports (or whole banks with date None) which were not loaded.
+            Forms are filled in place.
+        """
+        for form in forms:
+            form.transport.reserve(self.io_workers)
+            form.bank.transport.reserve(self.io_workers)
+
+        self._stop = threading.Event()
+        self._fetch_queue = queue.Queue(self.queue_size)
+        self._parse_queue = queue.Queue(self.queue_size)
+        # Parsed pages are consumed right away, the queue is bounded
+        # by the number of parse slots
+        self._events = queue.Queue()
+
+        threads = [threading.Thread(target=self._produce,
+                                    args=(forms, first_n, dates, since, until, update))]
+        threads += [threading.Thread(target=self._download, args=(forms,))
+                    for _ in range(self.io_workers)]
+        threads.append(threading.Thread(target=self._dispatch, args=(forms,)))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            return self._assemble(forms, update, callback)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _put(self, q, item):
+        """Put respecting queue bound, gives up when the pipeline is stopped"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def _produce(self, forms, first_n, dates, since, until, update):
+        """Stage 0: find report links of every form"""
+        try:
+            with ThreadPoolExecutor(self.io_workers) as executor:
+                futures = {executor.submit(form._report_links, first_n, dates, since, until,
+                                           update): i
+                           for i, form in enumerate(forms)}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        links = future.result()
+                    except FetchError as e:
+                        self._events.put(('failed', i, e))
+                        continue
+                    except Exception as e:
+                        # Not a bank page error is raised by assembly
+                        self._events.put(('error', i, e))
+                        return
+                    self._events.put(('links', i, len(links)))
+                    for date, url in links:
+                        if not self._put(self._fetch_queue, (i, date, url)):
+                            return
+        finally:
+            for _ in range(self.io_workers):
+                self._put(self._fetch_queue, _DONE)
+
+    def _download(self, forms):
+        """Stage 1: fetch pages"""
+        try:
+            while True:
+                unit = self._get(self._fetch_queue)
+                if unit is _DONE:
+                    return
+                i, date, url = unit
+                try:
+                    page = forms[i]._fetch(url)
+                except Exception as e:
+                    # Passed on with the unit, assembly records or raises it
+                    page = e
+                if not self._put(self._parse_queue, (i, date, url, page)):
+                    return
+        finally:
+            self._put(self._parse_queue, _DONE)
+
+    def _dispatch(self, forms):
+        """Stage 2: parse pages in the process pool, at most queue_size at once"""
+        slots = threading.Semaphore(self.queue_size)
+        pool = None
+        if self.parse_workers != 0:
+            pool = ProcessPoolExecutor(self.parse_workers, mp_context=_parse_context())
+        try:
+            finished = 0
+            while finished < self.io_workers:
+                item = self._get(self._parse_queue)
+                if item is _DONE:
+                    finished += 1
+                    continue
+                i, date, url, page = item
+                if isinstance(page, BaseException):
+                    self._events.put(('page', i, date, url, page))
+                    continue
+                parse = type(forms[i])._parse_page
+                if pool is None:
+                    try:
+                        result = parse(page)
+                    except Exception as e:
+                        result = e
+                    self._events.put(('page', i, date, url, result))
+                    continue
+                slots.acquire()
+                future = pool.submit(parse, page)
+                future.add_done_callback(partial(self._parsed, slots, i, date, url))
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+            self._events.put(_DONE)
+
+    def _parsed(self, slots, i, date, url, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            # Not a parse error (e.g. broken pool) is raised by assembly
+            result = e
+        self._events.put(('page', i, date, url, result))
+        slots.release()
+
+    def _assemble(self, forms, update, callback):
+        """Stage 3: fill every form as soon as all its pages are parsed"""
+        failed = []
+        expected, results = {}, {}
+        while True:
+            event = self._events.get()
+            if event is _DONE:
+                break
+            kind, i = event[:2]
+            form = forms[i]
+            if kind == 'error':
+                raise event[2]
+            if kind == 'failed':
+                # Bank page itself could not be loaded
+                failed.append(FailedUnit(form.bank.bank_id, form.form_type, None,
+                                         BANK_PAGE_URL_PATTERN % form.bank.bank_id, event[2]))
+                continue
+            if kind == 'links':
+                expected[i] = event[2]
+                results[i] = []
+                form.unparsed = []
+            else:
+                results[i].append(event[2:])
+            if len(results[i]) == expected[i]:
+                form._finish(*form._gather(results.pop(i)), merge=update)
+                failed.extend(form.failed)
+                if callback is not None:
+                    callback(form)
+        return failed
@@ -0,0 +1,150 @@
+# registry.py
+import re
+
+from bisect import bisect_left
+
+from .bank import Bank
+
+# Legal forms are not a part of the name for search
+LEGAL_FORMS = frozenset(['ооо', 'оао', 'пао', 'ао', 'зао', 'нко', 'кб', 'акб'])
+
+_TOKEN = re.compile(r'[0-9a-zа-я]+')
+
+
+def normalize_name(name):
+    """Tokens of bank's name: lower case, ё as е, without punctuation and legal forms"""
+    tokens = _TOKEN.findall(str(name).lower().replace('ё', 'е'))
+    return [t for t in tokens if t not in LEGAL_FORMS]
+
+
+def _key(value):
+    """Ids and license numbers are compared as strings, e.g. 1481 and '1481'"""
+    return str(value).strip()
+
+
+class BankRegistry:
+    """
+    Indexed list of active and closed banks.
+
+    Every bank is a single Bank instance, shared by all lookups, so its
+    downloaded page and report index are reused. Bank present in both
+    lists (e.g. closed after active list was loaded) is one bank with
+    closed status.
+
+    Parameters
+    ----------
+    active_banks : DataFrame
+        id, license_number, name (BankScraper.active_banks).
+    closed_banks : DataFrame
+        id, license_number, bank, name, ... (BankScraper.closed_banks).
+        Banks without cbr.ru id have id -1.
+    transport : Transport
+        Passed to created banks.
+    """
+
+    def __init__(self, active_banks=None, closed_banks=None, transport=None):
+        self._banks = {}      # license number -> Bank
+        self._closed = set()  # license numbers
+        self._by_id = {}
+        self._token_index = {}
+
+        for frame, closed in ((active_banks, False), (closed_banks, True)):
+            if frame is None:
+                continue
+            # Closed banks have short name from the list ('bank') and full
+            # one from the description ('name'), both are searched
+            names = frame['bank'] if 'bank' in frame else frame['name']
+            full_names = frame['name'] if 'name' in frame else names
+            for bank_id, license_number, name, full_name in zip(
+                    frame['id'], frame['license_number'], names, full_names):
+                self._add(bank_id, license_number, name, full_name, closed, transport)
+
+        self._tokens = sorted(self._token_index)
+
+    def _add(self, bank_id, license_number, name, full_name, closed, transport):
+        license_number = _key(license_number)
+        bank = self._banks.get(license_number)
+        if bank is None:
+            bank = Bank(bank_id, license_number, name, transport)
+            self._banks[license_number] = bank
+        elif _key(bank.bank_id) == '-1':
+            bank.bank_id = bank_id
+        if closed:
+            self._closed.add(license_number)
+        if _key(bank_id) != '-1':
+            self._by_id[_key(bank_id)] = bank
+        for token in set(normalize_name(name) + normalize_name(full_name)):
+            self._token_index.setdefault(token, set()).add(license_number)
+
+    @classmethod
+    def from_scraper(cls, scraper):
+        """Registry of banks loaded by BankScraper (get_banks or from_csv)"""
+        return cls(scraper.active_banks, scraper.closed_banks, scraper._transport)
+
+    def __len__(self):
+        return len(self._banks)
+
+    def __iter__(self):
+        return iter(self._banks.values())
+
+    def __contains__(self, license_number):
+        return _key(license_number) in self._banks
+
+    def __repr__(self):
+        return 'BankRegistry(%d active, %d closed)' % (
+            len(self._banks) - len(self._closed), len(self._closed))
+
+    def by_id(self, bank_id):
+        """Returns bank by its id on cbr.ru, KeyError if not found"""
+        return self._by_id[_key(bank_id)]
+
+    def by_license(self, license_number):
+        """Returns bank by license number, KeyError if not found"""
+        return self._banks[_key(license_number)]
+
+    def is_closed(self, bank):
+        """Bank or license number is in closed banks list"""
+        license_number = bank.license_number if isinstance(bank, Bank) else bank
+        return _key(license_number) in self._closed
+
+    @property
+    def active(self):
+        """List of active banks"""
+        return [bank for number, bank in self._banks.items() if number not in self._closed]
+
+    @property
+    def closed(self):
+        """List of closed banks with cbr.ru id"""
+        return [self._banks[number] for number in self._banks
+                if number in self._closed and _key(self._banks[number].bank_id) != '-1']
+
+    def _prefixed(self, prefix):
+        """License numbers of banks with a name token starting with prefix"""
+        found = set()
+        i = bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            found |= self._token_index[self._tokens[i]]
+            i += 1
+        return found
+
+    def search(self, query, limit=10):
+        """
+        Find banks by name. Every word of the query must be a beginning of
+        a word of the name, e.g. 'сбер' finds 'ПАО Сбербанк'.
+
+        Returns
+        -------
+        banks : list of Bank
+            Active banks first, then ones with the shortest names.
+        """
+        tokens = normalize_name(query)
+        if not tokens:
+            return []
+        found = None
+        for token in tokens:
+            found = self._prefixed(token) if found is None else found & self._prefixed(token)
+            if not found:
+                return []
+        banks = sorted(found, key=lambda number: (number in self._closed,
+                                                  len(str(self._banks[number].name)), number))
+        return [self._banks[number] for number in banks[:limit]]
@@ -0,0 +1,112 @@
+# retry.py
+import time
+import random
+import threading
+
+from .exceptions import FetchError, CircuitOpenError
+
+
+def is_retryable(error):
+    """Network errors, server errors and throttling are worth another try"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, FetchError):
+        return error.status is None or error.status >= 500 or error.status == 429
+    return isinstance(error, OSError)
+
+
+class RetryPolicy:
+    """
+    Retries with exponential backoff and full jitter.
+
+    Parameters
+    ----------
+    attempts : int
+        Total number of attempts.
+    base : float
+        Delay before the second attempt in seconds.
+    cap : float
+        Max delay.
+    jitter : bool
+        Draw every delay uniformly from [0, delay].
+    """
+
+    def __init__(self, attempts=4, base=0.5, cap=30, jitter=True):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.jitter = jitter
+
+    def __repr__(self):
+        return 'RetryPolicy(attempts=%s, base=%s, cap=%s)' % (self.attempts, self.base, self.cap)
+
+    def delay(self, attempt):
+        """Seconds to sleep after given (zero based) failed attempt"""
+        delay = min(self.cap, self.base * 2 ** attempt)
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def call(self, func, *args):
+        """Call func retrying on retryable errors"""
+        for attempt in range(self.attempts):
+            try:
+                return func(*args)
+            except Exception as e:
+                if attempt == self.attempts - 1 or not is_retryable(e):
+                    raise
+            time.sleep(self.delay(attempt))
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    After `threshold` consecutive failures requests to the host are
+    rejected for `cooldown` seconds, then a single trial request is let
+    through: success closes the circuit, failure opens it again.
+
+    Parameters
+    ----------
+    threshold : int
+        Consecutive failures opening the circuit.
+    cooldown : float
+        Seconds the circuit stays open.
+    """
+
+    def __init__(self, threshold=10, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._reset()
+
+    def _reset(self):
+        self._failures = {}
+        self._opened = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'threshold': self.threshold, 'cooldown': self.cooldown}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def before(self, host, url):
+        """Raise CircuitOpenError if requests to the host are not allowed"""
+        with self._lock:
+            opened = self._opened.get(host)
+            if opened is None:
+                return
+            if time.monotonic() - opened < self.cooldown:
+                raise CircuitOpenError(url, reason='Circuit for %s is open' % host)
+            # Half-open: let this request through, keep others waiting for its result
+            self._opened[host] = time.monotonic()
+
+    def success(self, host):
+        with self._lock:
+            self._failures[host] = 0
+            self._opened.pop(host, None)
+
+    def failure(self, host):
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if self._failures[host] >= self.threshold:
+                self._opened[host] = time.monotonic()
@@ -0,0 +1,213 @@
+# store.py
+import os
+import re
+import time
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .forms.panel import FormPanel
+from .forms.templates import get_template
+
+EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather'}
+
+_PARTITION = re.compile(r'^date=(\d{4}-\d{2}-\d{2})$')
+
+# Orders writes of the process within one clock tick
+_WRITES = itertools.count()
+
+
+def _arrow():
+    """pyarrow is an optional dependency needed only for the store"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.feather
+    except ImportError:
+        raise ImportError('FormStore requires pyarrow: pip install pyarrow')
+    return pyarrow
+
+
+class FormStore:
+    """
+    Columnar dataset of filled forms, partitioned by form and reporting date:
+
+        path/form=f_101/date=2016-08-01/part-<write time>-<counter>-<pid>.parquet
+
+    Every file holds one row per bank with typed columns: bank (string) and
+    a float64 column for every line item named by its number. Reads open
+    only partitions of requested dates and only columns of requested items,
+    so one account of all banks does not require the whole history.
+
+    Writes never modify existing files: every write adds a new file to the
+    partition, and a bank reported in several files is read from the latest
+    one (e.g. a report reloaded with fill(update=True)).
+
+    Parameters
+    ----------
+    path : str
+        Root directory of the dataset, created on first write.
+    format : str
+        'parquet' (compressed, filters by bank inside files) or 'feather'
+        (faster to read, larger).
+    """
+
+    def __init__(self, path, format='parquet'):
+        if format not in EXTENSIONS:
+            raise ValueError('Unknown format: %s' % format)
+        self.path = path
+        self.format = format
+
+    def __repr__(self):
+        return 'FormStore(%r, %s)' % (self.path, self.format)
+
+    def _form_dir(self, form_type):
+        return os.path.join(self.path, 'form=%s' % form_type)
+
+    def write(self, data):
+        """
+        Append forms to the dataset.
+
+        Parameters
+        ----------
+        data : FormPanel or list of filled forms of the same type
+            Every bank's report for a date must be given once (see
+            FormPanel.from_forms), reloaded reports go to the next write.
+        """
+        pa = _arrow()
+        panel = data if isinstance(data, FormPanel) else FormPanel.from_forms(data)
+        if len(panel.positions) != len(panel.template):
+            raise ValueError('Only whole forms can be stored')
+
+        names = ['bank'] + list(panel.numbers)
+        # Sorted by bank within a file, so row group statistics allow
+        # to skip rows of other banks
+        banks = panel.banks.astype(str)
+        order = np.lexsort((banks[panel.bank_index], panel.date_index))
+        # Names sort in order of writing, the latest write wins on read
+        token = '%020d-%010d-%d' % (time.time_ns(), next(_WRITES), os.getpid())
+
+        for d in np.unique(panel.date_index):
+            rows = order[panel.date_index[order] == d]
+            values = np.asfortranarray(panel.rows[rows], dtype=np.float64)
+            table = pa.table([pa.array(banks[panel.bank_index[rows]], pa.string())] +
+                             [pa.array(values[:, j]) for j in range(values.shape[1])],
+                             names=names)
+
+            directory = os.path.join(self._form_dir(panel.template.form_type),
+                                     'date=%s' % str(panel.dates[d])[:10])
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, 'part-%s%s' % (token, EXTENSIONS[self.format]))
+            tmp = path + '.tmp'
+            if self.format == 'parquet':
+                pa.parquet.write_table(table, tmp)
+            else:
+                pa.feather.write_feather(table, tmp)
+            os.replace(tmp, path)
+
+    def _partitions(self, form_type, dates=None, since=None, until=None):
+        """(date, files in order of writing) of partitions matching the filters"""
+        directory = self._form_dir(form_type)
+        if not os.path.isdir(directory):
+            return []
+        if dates is not None:
+            dates = set(pd.to_datetime(list(dates)).values.astype('datetime64[D]'))
+        extension = EXTENSIONS[self.format]
+
+        partitions = []
+        for name in sorted(os.listdir(directory)):
+            match = _PARTITION.match(name)
+            if not match:
+                continue
+            date = np.datetime64(match.group(1), 'D')
+            if dates is not None and date not in dates:
+                continue
+            if since is not None and date < np.datetime64(pd.Timestamp(since), 'D'):
+                continue
+            if until is not None and date > np.datetime64(pd.Timestamp(until), 'D'):
+                continue
+            files = sorted(f for f in os.listdir(os.path.join(directory, name))
+                           if f.startswith('part-') and f.endswith(extension))
+            if files:
+                partitions.append((date, [os.path.join(directory, name, f) for f in files]))
+        return partitions
+
+    def dates(self, form_type):
+        """Reporting dates stored for the form, without reading the data"""
+        return np.array([date for date, _ in self._partitions(form_type)],
+                        dtype='datetime64[ns]')
+
+    def _read_file(self, path, columns, banks):
+        pa = _arrow()
+        if self.format == 'parquet':
+            filters = [('bank', 'in', banks)] if banks is not None else None
+            return pa.parquet.read_table(path, columns=columns, filters=filters)
+        table = pa.feather.read_table(path, columns=columns)
+        if banks is not None:
+            mask = np.isin(table.column('bank').to_numpy(zero_copy_only=False), banks)
+            table = table.filter(pa.array(mask))
+        return table
+
+    def read(self, form_type, banks=None, dates=None, since=None, until=None, items=None,
+             dtype=float):
+        """
+        Read part of the dataset.
+
+        Parameters
+        ----------
+        form_type : str
+            f_101, f_102, ...
+        banks : list
+            Bank ids, all if None.
+        dates : list
+            Reporting dates (anything accepted by pd.to_datetime).
+        since, until : date
+            Range of reporting dates (inclusive).
+        items : list of str
+            Numbers of line items, all if None.
+        dtype : numpy dtype
+            Type of balances in the panel.
+
+        Returns
+        -------
+        panel : FormPanel
+            Bank ids are strings.
+        """
+        template = get_template(form_type)
+        if items is None:
+            positions = None
+            numbers = list(template.numbers)
+        else:
+            positions = np.sort([template.positions[str(n)] for n in items])
+            numbers = list(template.numbers[positions])
+        if banks is not None:
+            banks = [str(b) for b in banks]
+
+        row_banks, row_dates, blocks = [], [], []
+        for date, files in self._partitions(form_type, dates, since, until):
+            for path in files:
+                table = self._read_file(path, ['bank'] + numbers, banks)
+                if not table.num_rows:
+                    continue
+                row_banks.append(table.column('bank').to_numpy(zero_copy_only=False))
+                row_dates.append(np.full(table.num_rows, date, dtype='datetime64[ns]'))
+                blocks.append(np.column_stack(
+                    [table.column(n).to_numpy() for n in numbers]).astype(dtype, copy=False))
+
+        if not blocks:
+            return FormPanel(template, [], [], np.zeros((0, len(numbers)), dtype=dtype),
+                             [], [], positions)
+
+        row_banks = np.concatenate(row_banks).astype(object)
+        row_dates = np.concatenate(row_dates)
+        rows = np.concatenate(blocks)
+        # The latest write of a (bank, date) wins
+        keep = ~pd.DataFrame({'bank': row_banks, 'date': row_dates}).duplicated(keep='last').values
+        row_banks, row_dates, rows = row_banks[keep], row_dates[keep], rows[keep]
+
+        all_banks = pd.unique(row_banks)
+        all_dates = np.unique(row_dates)
+        return FormPanel(template, all_banks, all_dates, rows,
+                         pd.Index(all_banks).get_indexer(row_banks),
+                         np.searchsorted(all_dates, row_dates), positions)
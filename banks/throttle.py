@@ -0,0 +1,220 @@
+# throttle.py
+import os
+import time
+import struct
+import threading
+
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets are shared between threads only
+    fcntl = None
+
+_STATE = struct.Struct('dd')
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+
+    If `path` is given the bucket state is kept in this file under an
+    exclusive lock, so all processes using the same file share one rate.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    burst : float
+        Bucket capacity.
+    path : str
+        State file shared between processes. In-memory bucket if None.
+    """
+
+    def __init__(self, rate, burst=1, path=None):
+        self.rate = rate
+        self.burst = burst
+        self.path = path if fcntl is not None else None
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._stamp = time.monotonic() if self.path is None else time.time()
+
+    def __getstate__(self):
+        return {'rate': self.rate, 'burst': self.burst, 'path': self.path}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def _take(self, tokens, stamp, now):
+        """Returns new state and seconds to wait before token is available"""
+        tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, 0
+        return tokens, (1 - tokens) / self.rate
+
+    def _try_acquire(self):
+        with self._lock:
+            if self.path is None:
+                now = time.monotonic()
+                self._tokens, wait = self._take(self._tokens, self._stamp, now)
+                self._stamp = now
+                return wait
+
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                data = os.read(fd, _STATE.size)
+                now = time.time()
+                if len(data) == _STATE.size:
+                    tokens, stamp = _STATE.unpack(data)
+                else:
+                    tokens, stamp = self.burst, now
+                tokens, wait = self._take(tokens, stamp, now)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, _STATE.pack(tokens, now))
+            finally:
+                os.close(fd)
+            return wait
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class AIMDController:
+    """
+    Adaptive limit of simultaneous requests.
+
+    The limit grows additively (about +1 per limit successful requests)
+    while latency stays close to the best one seen, and is cut
+    multiplicatively on errors, timeouts and latency spikes.
+
+    Parameters
+    ----------
+    initial, minimum, maximum : int
+        Starting, lowest and highest limit.
+    decrease : float
+        Multiplier applied to the limit on congestion.
+    latency_factor : float
+        Latency above best one multiplied by this factor is a congestion.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=64, decrease=0.5, latency_factor=3.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.limit = float(initial)
+        self._reset()
+
+    def _reset(self):
+        self.in_flight = 0
+        self._base_latency = None
+        self._last_decrease = 0
+        self._cond = threading.Condition()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ('in_flight', '_base_latency', '_last_decrease', '_cond'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def acquire(self):
+        """Block until number of requests in flight is below the limit"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency, ok=True):
+        """Report finished request and adjust the limit"""
+        with self._cond:
+            self.in_flight -= 1
+            if ok and (self._base_latency is None or latency < self._base_latency):
+                self._base_latency = latency
+
+            congested = not ok or latency > self._base_latency * self.latency_factor
+            now = time.monotonic()
+            if congested:
+                # Requests started before previous decrease report the same congestion
+                if now - self._last_decrease > (self._base_latency or latency):
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class HostLimiter:
+    """
+    Token bucket and AIMD controller for every host.
+
+    Rate is shared by all processes when `state_dir` is given, concurrency
+    limit adapts in every process independently.
+
+    Parameters
+    ----------
+    rate : float
+        Requests per second for a single host.
+    burst : float
+        Bucket capacity.
+    concurrency : int
+        Max number of simultaneous requests to a single host.
+    state_dir : str
+        Directory for shared token bucket files.
+    """
+
+    def __init__(self, rate=5, burst=10, concurrency=32, state_dir=None):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.state_dir = state_dir
+        if state_dir is not None:
+            os.makedirs(state_dir, exist_ok=True)
+        self._reset()
+
+    def _reset(self):
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'rate': self.rate, 'burst': self.burst,
+                'concurrency': self.concurrency, 'state_dir': self.state_dir}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def _get(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                path = None
+                if self.state_dir is not None:
+                    path = os.path.join(self.state_dir, host + '.bucket')
+                self._hosts[host] = (TokenBucket(self.rate, self.burst, path),
+                                     AIMDController(maximum=self.concurrency))
+            return self._hosts[host]
+
+    def acquire(self, host):
+        bucket, controller = self._get(host)
+        controller.acquire()
+        bucket.acquire()
+
+    def release(self, host, latency, ok=True):
+        self._get(host)[1].release(latency, ok)
+
+    def limit(self, url):
+        """Current concurrency limit for the url's host"""
+        return int(self._get(urlsplit(url).hostname)[1].limit)
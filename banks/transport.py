@@ -0,0 +1,273 @@
+# transport.py
+import os
+import zlib
+import time
+import threading
+
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from urllib.parse import urlsplit, urljoin, quote
+
+from .exceptions import FetchError
+from .retry import RetryPolicy
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; cbr-scraper)',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+def _decode(body, encoding):
+    """Decompress body according to Content-Encoding header"""
+    encoding = (encoding or '').lower()
+    if encoding == 'gzip':
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate stream without zlib header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+class Transport:
+    """
+    HTTP transport with per-host keep-alive connection pool.
+
+    One instance can be shared by Bank, BankScraper and all forms. It is
+    thread safe and can be pickled (the pool is not transferred, so every
+    process gets its own connections).
+
+    Parameters
+    ----------
+    timeout : float
+        Socket timeout in seconds.
+    pool_size : int
+        Max number of idle connections kept per host. Connections above it
+        are closed after the request, so it should not be less than the
+        number of simultaneous requests. Crawler, Pipeline and BankScraper
+        raise it to their concurrency (see reserve).
+    headers : dict
+        Extra headers sent with every request.
+    max_redirects : int
+        Max number of redirects to follow.
+    cache : ResponseCache
+        Consulted by get() before any request. No caching if None.
+    limiter : HostLimiter
+        Limits rate and concurrency of requests to every host.
+    retry : RetryPolicy
+        Retries of get() on network errors, 5xx and 429. Single attempt if None.
+    breaker : CircuitBreaker
+        Stops requests to hosts which keep failing.
+    """
+
+    def __init__(self, timeout=30, pool_size=10, headers=None, max_redirects=5, cache=None,
+                 limiter=None, retry=RetryPolicy(), breaker=None):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.headers = dict(DEFAULT_HEADERS)
+        self.headers.update(headers or {})
+        self.max_redirects = max_redirects
+        self.cache = cache
+        self.limiter = limiter
+        self.retry = retry
+        self.breaker = breaker
+        self._reset()
+
+    def _reset(self):
+        self._pool = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ('_pool', '_lock', '_pid'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def __repr__(self):
+        return 'Transport(timeout=%s, pool_size=%s)' % (self.timeout, self.pool_size)
+
+    def reserve(self, connections):
+        """Keep at least this many idle connections per host, e.g. one per worker"""
+        if self.pool_size < connections:
+            self.pool_size = connections
+
+    def _checkout(self, key):
+        """Take idle connection for given host or create new one"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked process must not reuse parent's sockets
+                self._pool = {}
+                self._pid = os.getpid()
+            idle = self._pool.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        cls = HTTPSConnection if scheme == 'https' else HTTPConnection
+        return cls(host, port, timeout=self.timeout), False
+
+    def _checkin(self, key, conn):
+        """Return connection to the pool"""
+        with self._lock:
+            idle = self._pool.setdefault(key, [])
+            if len(idle) < self.pool_size and self._pid == os.getpid():
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, url, headers=None):
+        """
+        Perform GET request following redirects.
+
+        Returns
+        -------
+        status, headers, body : int, dict, bytes
+            Headers have lower-cased names, body is already decoded.
+        """
+        for _ in range(self.max_redirects + 1):
+            status, response_headers, body = self._guarded_request(url, headers)
+            if status in REDIRECT_CODES and 'location' in response_headers:
+                url = urljoin(url, response_headers['location'])
+                continue
+            return status, response_headers, body
+        raise FetchError(url, reason='Too many redirects')
+
+    def _guarded_request(self, url, headers=None):
+        """Single request passing through the circuit breaker"""
+        if self.breaker is None:
+            return self._request(url, headers)
+        host = urlsplit(url).hostname
+        self.breaker.before(host, url)
+        try:
+            response = self._request(url, headers)
+        except FetchError:
+            self.breaker.failure(host)
+            raise
+        if response[0] >= 500 or response[0] == 429:
+            self.breaker.failure(host)
+        else:
+            self.breaker.success(host)
+        return response
+
+    def _request(self, url, headers=None):
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        key = (scheme, parts.hostname, parts.port)
+        path = quote(parts.path or '/', safe="/%:@!$&'()*+,;=~")
+        if parts.query:
+            path += '?' + quote(parts.query, safe="/%:@!$&'()*+,;=~?")
+
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+
+        while True:
+            conn, reused = self._checkout(key)
+            if self.limiter is not None:
+                self.limiter.acquire(parts.hostname)
+            start = time.monotonic()
+            try:
+                conn.request('GET', path, headers=request_headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (HTTPException, OSError) as e:
+                conn.close()
+                if reused:
+                    # Server has closed idle keep-alive connection, try fresh one
+                    self._release(parts.hostname, start, True)
+                    continue
+                self._release(parts.hostname, start, False)
+                raise FetchError(url, reason=str(e)) from e
+            self._release(parts.hostname, start, response.status < 500 and response.status != 429)
+            break
+
+        response_headers = {k.lower(): v for k, v in response.getheaders()}
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+        # Responses without content (e.g. 304 on revalidation) keep the
+        # Content-Encoding of the cached body
+        if body and not (100 <= response.status < 200 or response.status in (204, 304)):
+            encoding = response_headers.get('content-encoding')
+            try:
+                body = _decode(body, encoding)
+            except zlib.error as e:
+                raise FetchError(url, response.status,
+                                 reason='Broken %s body: %s' % (encoding, e)) from e
+        return response.status, response_headers, body
+
+    def _release(self, host, start, ok):
+        if self.limiter is not None:
+            self.limiter.release(host, time.monotonic() - start, ok)
+
+    def get(self, url):
+        """
+        Returns body of the page, raises FetchError on non 2xx status and
+        on any I/O error (including the cache's).
+        """
+        try:
+            if self.retry is None:
+                return self._get(url)
+            return self.retry.call(self._get, url)
+        except FetchError:
+            raise
+        except OSError as e:
+            raise FetchError(url, reason=str(e)) from e
+
+    def _get(self, url):
+        cached = self.cache.load(url) if self.cache is not None else None
+        if cached is not None:
+            meta, body = cached
+            if self.cache.is_fresh(url, meta):
+                return body
+            status, headers, new_body = self.request(url, self.cache.validators(meta))
+            if status == 304:
+                self.cache.touch(url, meta)
+                return body
+        else:
+            status, headers, new_body = self.request(url)
+
+        if not 200 <= status < 300:
+            raise FetchError(url, status)
+        if self.cache is not None:
+            self.cache.store(url, headers, new_body)
+        return new_body
+
+    def evict(self, url):
+        """Forget cached response of the url, it is requested again by the next get"""
+        if self.cache is not None:
+            self.cache.evict(url)
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            pool, self._pool = self._pool, {}
+        for idle in pool.values():
+            for conn in idle:
+                conn.close()
+
+
+_default_transport = None
+
+
+def get_default_transport():
+    """Returns transport shared by all objects created without explicit one"""
+    global _default_transport
+    if _default_transport is None:
+        _default_transport = Transport()
+    return _default_transport
+
+
+def set_default_transport(transport):
+    """Replace process wide default transport"""
+    global _default_transport
+    _default_transport = transport
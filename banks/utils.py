@@ -1,5 +1,12 @@
 import unicodedata
 
+import numpy as np
+import pandas as pd
+
+# Cells meaning "no value"
+BLANKS = ('', '-', '—', '–', 'nan', 'None')
+
+
 def to_number(s):
     s = unicodedata.normalize("NFKD", str(s))
     s=s.replace(' ','').replace(',','.')
@@ -8,3 +15,37 @@ def to_number(s):
     except:
         s = 0
     return s
+
+
+def to_numbers(values, errors=None):
+    """
+    Vectorized to_number for a whole column.
+
+    Spaces (including non-breaking), decimal comma and unicode minus are
+    normalized, blank and dash cells become 0.
+
+    Parameters
+    ----------
+    values : array-like
+        Cells of the column.
+    errors : list
+        If given, (position, value) of every cell which is not a number is
+        appended to it. Such cells become 0 as well.
+
+    Returns
+    -------
+    numbers : np.ndarray of float
+    """
+    values = np.asarray(values, dtype=object)
+    s = pd.Series(values).astype(str)
+    s = (s.str.normalize('NFKD')
+          .str.replace(r'\s+', '', regex=True)
+          .str.replace(',', '.', regex=False)
+          .str.replace('−', '-', regex=False))
+    blank = s.isin(BLANKS).to_numpy()
+    numbers = pd.to_numeric(s.where(~blank), errors='coerce').to_numpy(dtype=float)
+    bad = np.isnan(numbers) & ~blank
+    if errors is not None:
+        errors.extend(zip(np.flatnonzero(bad).tolist(), values[bad].tolist()))
+    numbers[np.isnan(numbers)] = 0
+    return numbers
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from banks.bank import Bank, BANK_PAGE_URL_PATTERN, REPORT_URL_PREFIX
+from banks.exceptions import FetchError
+
+MONTHS = ['Января', 'Февраля', 'Марта', 'Апреля', 'Мая', 'Июня', 'Июля', 'Августа',
+          'Сентября', 'Октября', 'Ноября', 'Декабря']
+
+
+class FakeTransport:
+    """
+    Serves pages from a dict url -> bytes (or exception to raise), records
+    requested and evicted urls. Unknown urls are 404.
+    """
+
+    def __init__(self, pages=None):
+        self.pages = dict(pages or {})
+        self.requests = []
+        self.evicted = []
+        self.pool_size = 10
+
+    def get(self, url):
+        self.requests.append(url)
+        page = self.pages.get(url)
+        if page is None:
+            raise FetchError(url, 404)
+        if isinstance(page, BaseException):
+            raise page
+        return page
+
+    def reserve(self, connections):
+        self.pool_size = max(self.pool_size, connections)
+
+    def evict(self, url):
+        self.evicted.append(url)
+
+    def reports(self):
+        """Requested report pages, without bank pages"""
+        return [url for url in self.requests if 'coinfo' not in url]
+
+
+def html(body):
+    return ('<html><head><meta charset="utf-8"></head><body>%s</body></html>' % body).encode('utf8')
+
+
+def report_url(form_type, bank_id, date):
+    date = pd.Timestamp(date)
+    return REPORT_URL_PREFIX + '%s.asp?id=%s&dt=%s' % (form_type[2:], bank_id, date.strftime('%Y%m%d'))
+
+
+def bank_page(bank_id, reports):
+    """Bank page of cbr.ru with report links, reports: form type -> dates"""
+    blocks = []
+    for form_type, dates in reports.items():
+        years = {}
+        for date in sorted(pd.to_datetime(dates), reverse=True):
+            href = report_url(form_type, bank_id, date)[len(REPORT_URL_PREFIX):]
+            years.setdefault(date.year, []).append(
+                '<a href="%s">%02d %s</a>' % (href.replace('&', '&amp;'), date.day,
+                                               MONTHS[date.month - 1]))
+        inner = ''.join('<div class="normal" id="%s_%d">%s</div>' % (form_type, year, ''.join(links))
+                        for year, links in years.items())
+        blocks.append('<div id="%s"><div class="switched">%s</div></div>' % (form_type, inner))
+    return html('<table><tr><td>Рег. номер</td><td>%s</td></tr></table>'
+                '<div class="reports">%s</div>' % (bank_id, ''.join(blocks)))
+
+
+def form102_page(values):
+    """Form 102 report page, values: symbol -> amount"""
+    rows = ''.join('<tr><td>Статья</td><td>%s</td><td>%s</td></tr>' % item for item in values.items())
+    return html('<table><tr><td>Банк</td></tr></table>'
+                '<table><tr><td>Наименование</td><td>Символ</td><td>Сумма</td></tr>%s</table>' % rows)
+
+
+def site(reports):
+    """
+    Pages of banks having form 102, reports: bank id -> {date: amount of
+    symbol 11101}.
+    """
+    pages = {}
+    for bank_id, dates in reports.items():
+        pages[BANK_PAGE_URL_PATTERN % bank_id] = bank_page(bank_id, {'f_102': list(dates)})
+        for date, amount in dates.items():
+            pages[report_url('f_102', bank_id, date)] = form102_page({'11101': amount, '11102': 1})
+    return FakeTransport(pages)
+
+
+def filled(form_class, bank_id, dates, value):
+    """Form filled with the same value of every line item"""
+    form = form_class(Bank(bank_id, bank_id, 'Банк %s' % bank_id))
+    form.date = pd.to_datetime(list(dates)).values
+    form._values = np.full((len(dates), len(form.template)), float(value))
+    form.is_filled = True
+    return form
+
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from banks import BankScraper
+from banks.bankscraper import MEMORY_URL
+
+from conftest import FakeTransport, html
+
+PER_PAGE = 3
+LICENSES = [str(1000 + i) for i in range(8)]  # newest first
+
+
+def memory_page(licenses, pages):
+    """Page of banki.ru memory book with navigation links to pages"""
+    rows = ''.join('<tr><td>%d</td><td><a href="/banks/memory/bank/?id=%s">Банк %s</a></td>'
+                   '<td>%s</td><td>отозв.</td><td>01.01.2016</td><td>Москва</td></tr>'
+                   % (i, lic, lic, lic) for i, lic in enumerate(licenses))
+    nav = ''.join('<a href="/banks/memory/?PAGEN_1=%d">%d</a>' % (i, i) for i in pages)
+    return html('<table><tr><td>x</td></tr></table><table><tr><td>y</td></tr></table>'
+                '<table><thead><tr><th>№</th><th>Банк</th></tr></thead><tbody>%s</tbody></table>'
+                '<div>%s</div>' % (rows, nav))
+
+
+def memory_book(licenses=LICENSES, nav=None, claimed=None):
+    """
+    Transport serving the memory book. nav(n, last) gives page numbers shown
+    on page n, claimed is the number of pages in navigation (the site
+    returns the last page for numbers out of range).
+    """
+    last = (len(licenses) + PER_PAGE - 1) // PER_PAGE
+    claimed = claimed or last
+    nav = nav or (lambda n, last: range(1, last + 1))
+    pages = {}
+    for n in range(1, claimed + 2):
+        page = min(n, last)
+        content = memory_page(licenses[(page - 1) * PER_PAGE:page * PER_PAGE], nav(n, claimed))
+        pages[MEMORY_URL + '?PAGEN_1=%d' % n] = content
+    pages[MEMORY_URL] = pages.pop(MEMORY_URL + '?PAGEN_1=1')
+    return FakeTransport(pages)
+
+
+def closed_list(transport, known=None):
+    with ThreadPoolExecutor(2) as executor:
+        return BankScraper(2, transport=transport)._get_closed_list(executor, known)
+
+
+def pages(transport):
+    return sorted(int(url.rpartition('=')[2]) if '=' in url else 1 for url in transport.requests)
+
+
+def test_all_pages():
+    transport = memory_book()
+    closed = closed_list(transport)
+    assert list(closed.license_number) == LICENSES
+    assert list(closed.bank[:1]) == ['Банк 1000']
+    assert pages(transport) == [1, 2, 3]
+
+
+def test_navigation_of_neighbour_pages():
+    transport = memory_book(nav=lambda n, last: range(max(1, n - 1), min(last, n + 1) + 1))
+    assert list(closed_list(transport).license_number) == LICENSES
+    assert pages(transport) == [1, 2, 3]
+
+
+def test_stops_at_repeated_last_page():
+    transport = memory_book(claimed=5)
+    assert list(closed_list(transport).license_number) == LICENSES
+    assert 4 in pages(transport)
+
+
+def test_stops_at_empty_page():
+    transport = memory_book()
+    transport.pages[MEMORY_URL + '?PAGEN_1=2'] = memory_page([], range(1, 4))
+    assert list(closed_list(transport).license_number) == LICENSES[:PER_PAGE]
+
+
+@pytest.mark.parametrize('new, read', [(2, [1, 2]), (0, [1]), (5, [1, 2, 3])])
+def test_known_banks(new, read):
+    transport = memory_book()
+    closed = closed_list(transport, known=LICENSES[new:])
+    assert set(LICENSES[:new]) <= set(closed.license_number)
+    assert pages(transport) == read
@@ -0,0 +1,82 @@
+from banks import Bank, ResponseCache
+from banks.forms import Form102
+
+from conftest import report_url, site
+
+DATES = {'2016-05-01': 5, '2016-06-01': 10, '2016-07-01': 20}
+
+
+def form(transport):
+    return Form102(Bank(1, 1, 'b', transport))
+
+
+def dates(form):
+    return [str(date)[:10] for date in form.date]
+
+
+def test_fill_selected_dates():
+    transport = site({1: DATES})
+    f = form(transport).fill(dates=['2016-06-01'])
+    assert dates(f) == ['2016-06-01']
+    assert transport.reports() == [report_url('f_102', 1, '2016-06-01')]
+
+    f = form(transport).fill(since='2016-06-01')
+    assert dates(f) == ['2016-06-01', '2016-07-01']
+    f = form(transport).fill(until='2016-05-31')
+    assert dates(f) == ['2016-05-01']
+    f = form(transport).fill(first_n=1)
+    assert dates(f) == ['2016-07-01']
+
+
+def test_fill_update_loads_only_new_reports():
+    transport = site({1: DATES})
+    f = form(transport).fill(until='2016-06-01')
+    transport.pages[report_url('f_102', 1, '2016-06-01')] = b'<html></html>'
+
+    # New report is published on the bank page
+    new = site({1: dict(DATES, **{'2016-08-01': 40})})
+    transport.pages.update({url: page for url, page in new.pages.items()
+                            if url not in transport.pages or 'coinfo' in url})
+    f.bank.invalidate()
+    transport.requests.clear()
+    f.fill(update=True)
+
+    assert sorted(transport.reports()) == [report_url('f_102', 1, '2016-07-01'),
+                                           report_url('f_102', 1, '2016-08-01')]
+    assert dates(f) == ['2016-05-01', '2016-06-01', '2016-07-01', '2016-08-01']
+    assert f.to_dataframe()[11101].tolist() == [5, 10, 20, 40]
+    assert f.failed == []
+
+
+def test_retry_failed():
+    transport = site({1: DATES})
+    url = report_url('f_102', 1, '2016-06-01')
+    good, transport.pages[url] = transport.pages[url], b'<html>error</html>'
+    f = form(transport).fill()
+    assert [unit.url for unit in f.failed] == [url]
+    assert transport.evicted == [url]
+
+    transport.pages[url] = good
+    f.retry_failed()
+    assert f.failed == []
+    assert f.to_dataframe()[11101].tolist() == [5, 10, 20]
+
+
+def test_cache_evict(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    url = report_url('f_102', 1, '2016-06-01')
+    cache.store(url, {}, b'page')
+    assert cache.load(url)[1] == b'page'
+    cache.evict(url)
+    assert cache.load(url) is None
+    cache.evict(url)
+
+
+def test_load_dataframe_then_update():
+    transport = site({1: DATES})
+    saved = form(transport).fill(until='2016-06-01').to_dataframe()
+
+    transport.requests.clear()
+    f = form(transport).load_dataframe(saved).fill(update=True)
+    assert transport.reports() == [report_url('f_102', 1, '2016-07-01')]
+    assert f.to_dataframe()[11101].tolist() == [5, 10, 20]
@@ -0,0 +1,85 @@
+import pytest
+
+from banks import Bank, BankScraper
+from banks.exceptions import FetchError
+from banks.forms import Form102
+from banks.journal import CrawlJournal, DONE, FAILED
+from banks.pipeline import Pipeline
+
+from conftest import report_url, site
+
+pytest.importorskip('pyarrow')
+from banks.store import FormStore  # noqa: E402
+
+DATES = {'2016-06-01': 10, '2016-07-01': 20, '2016-08-01': 30}
+FAILING = report_url('f_102', 1, '2016-07-01')
+
+
+def crawl(transport, journal, store, pipeline=None):
+    scraper = BankScraper(2, transport=transport)
+    banks = [Bank(i, i, 'b', transport) for i in (1, 2)]
+    return scraper.load_forms(banks, [Form102], pipeline=pipeline, journal=journal,
+                              store=store, checkpoint=1)
+
+
+@pytest.fixture
+def transport():
+    transport = site({1: DATES, 2: DATES})
+    transport.pages[FAILING] = FetchError(FAILING, 500)
+    return transport
+
+
+def statuses(journal):
+    units = journal.units()
+    return {(bank, str(date)[:10]): (status, attempts) for bank, date, status, attempts in
+            zip(units.bank_id, units.date, units.status, units.attempts)}
+
+
+@pytest.mark.parametrize('pipeline', [None, Pipeline(io_workers=2, parse_workers=0)],
+                         ids=['async', 'pipeline'])
+def test_resume(tmp_path, transport, pipeline):
+    journal = CrawlJournal(str(tmp_path / 'crawl.db'))
+    store = FormStore(str(tmp_path / 'store'))
+
+    panels, failed = crawl(transport, journal, store, pipeline)
+    assert [unit.url for unit in failed] == [FAILING]
+    units = statuses(journal)
+    assert units[('1', '2016-07-01')] == (FAILED, 1)
+    assert sum(status == DONE for status, _ in units.values()) == 5
+    assert store.read('f_102').shape == (2, 3, 271)
+
+    # Second run requests only the failed report
+    transport.requests.clear()
+    transport.pages[FAILING] = transport.pages[report_url('f_102', 2, '2016-07-01')]
+    panels, failed = crawl(transport, journal, store, pipeline)
+    assert failed == []
+    assert transport.reports() == [FAILING]
+    assert statuses(journal)[('1', '2016-07-01')] == (DONE, 2)
+    assert panels['f_102'].shape == (1, 1, 271)
+
+    stored = store.read('f_102', items=['11101'])
+    assert len(stored.rows) == 6
+    assert stored.sel(banks=['1']).rows.ravel().tolist() == [10, 20, 30]
+
+    # Nothing is left to load
+    transport.requests.clear()
+    panels, failed = crawl(transport, journal, store, pipeline)
+    assert transport.reports() == [] and panels == {}
+
+
+def test_max_attempts(tmp_path, transport):
+    journal = CrawlJournal(str(tmp_path / 'crawl.db'), max_attempts=1)
+    store = FormStore(str(tmp_path / 'store'))
+    crawl(transport, journal, store)
+
+    transport.requests.clear()
+    crawl(transport, journal, store)
+    assert transport.reports() == []
+    assert statuses(journal)[('1', '2016-07-01')] == (FAILED, 1)
+
+
+def test_journal_requires_store(tmp_path, transport):
+    journal = CrawlJournal(str(tmp_path / 'crawl.db'))
+    with pytest.raises(ValueError):
+        crawl(transport, journal, None)
+    assert transport.requests == []
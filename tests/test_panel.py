@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from banks.forms import Form102, FormPanel
+
+from conftest import filled
+
+
+@pytest.fixture
+def panel():
+    return FormPanel.from_forms([
+        filled(Form102, 1, ['2016-06-01', '2016-07-01'], 1),
+        filled(Form102, 2, ['2016-07-01', '2016-08-01'], 2),
+    ])
+
+
+def test_from_forms(panel):
+    assert panel.shape == (2, 3, 271)
+    values = panel.values[:, :, 0]
+    assert np.array_equal(values, [[1, 1, np.nan], [np.nan, 2, 2]], equal_nan=True)
+
+
+def test_from_forms_rejects_duplicates():
+    forms = [filled(Form102, 1, ['2016-06-01', '2016-07-01'], 1),
+             filled(Form102, 1, ['2016-07-01'], 2)]
+    with pytest.raises(ValueError, match='2016-07-01'):
+        FormPanel.from_forms(forms)
+
+
+def test_sel(panel):
+    part = panel.sel(banks=[2], dates=['2016-07-01', '2016-08-01'], items=['11102', '11101'])
+    assert part.shape == (1, 2, 2)
+    assert list(part.numbers) == ['11101', '11102']
+    assert part.rows.tolist() == [[2, 2], [2, 2]]
+
+    june = panel.sel(dates=['2016-06-01'])
+    assert june.shape == (2, 1, 271)
+    assert np.isnan(june.values[1]).all()
+    assert panel.sel(banks=[3]).shape == (0, 3, 271)
+    with pytest.raises(KeyError):
+        part.sel(items=['11103'])
+
+
+def test_hierarchy(panel):
+    node = panel.template.root.children['Доходы']
+    income = panel.Доходы
+    assert np.array_equal(income.positions, node.index)
+    assert income.rows.shape == (4, len(node.index))
+    # Contiguous items are a view of the panel's rows
+    assert np.shares_memory(income.rows, panel.rows)
+
+    child = next(iter(node.children))
+    assert np.array_equal(getattr(income, child).positions, node.children[child].index)
+    assert income.sel(banks=[1]).shape == (1, 3, len(node.index))
+    with pytest.raises(AttributeError):
+        panel.Нет_такого_раздела
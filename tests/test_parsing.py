@@ -0,0 +1,186 @@
+import io
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from banks.forms.form101 import Form101
+from banks.forms.form102 import Form102
+from banks.forms.form123 import Form123
+from banks.forms.form135 import Form135
+from banks.forms.parsing import ReportPage, filled_rows
+
+
+def page(*tables, h2='', after=''):
+    body = '<h2>%s</h2>' % h2 if h2 else ''
+    body += '<table><tr><td>Банк</td><td>1481</td></tr></table>'
+    body += ''.join('<table>%s</table>' % t for t in tables)
+    return ('<html><head><meta charset="utf-8"></head><body>%s%s</body></html>'
+            % (body, after)).encode('utf8')
+
+
+def tr(*cells, tag='td'):
+    return '<tr>%s</tr>' % ''.join(
+        c if c.startswith('<t') else '<%s>%s</%s>' % (tag, c, tag) for c in cells)
+
+
+def read_html(page):
+    return pd.read_html(io.BytesIO(page), keep_default_na=False, encoding='utf8')
+
+
+def assert_parity(page):
+    """Every table of the page is the same as DataFrame of read_html"""
+    report = ReportPage(page)
+    frames = read_html(page)
+    for i, df in enumerate(frames):
+        table = report.table(i)
+        assert table.shape == df.shape, i
+        for (r, c), value in np.ndenumerate(df.values):
+            cell = table[r, c]
+            if isinstance(value, str):
+                # read_html drops thousands separators even in text columns
+                assert value in (cell, cell.replace(',', '')), (i, r, c)
+            else:
+                assert float(cell.replace(',', '')) == float(value), (i, r, c)
+    with pytest.raises(ValueError):
+        report.table(len(frames))
+
+
+F101_CODE = page(
+    tr('Номер счета', 'Входящие остатки', '', '', '', 'Обороты за отчетный период',
+       '', '', '', 'Исходящие остатки', '', '', '') +
+    tr('', '<td colspan="2">в рублях</td>', '<td colspan="2">ин. вал.</td>',
+       '<td colspan="4">дебет / кредит</td>', '<td colspan="4">итого</td>') +
+    tr('', *['р.', 'в.'] * 6) +
+    tr(*[str(i) for i in range(1, 14)]) +
+    tr('Счета') +
+    tr('10207', *['1'] * 11, '1 000,5') +
+    tr('20202', *['2'] * 11, '-1 500') +
+    tr('Итого', *[''] * 11, '500') +
+    tr('30102', *['3'] * 11, '7 000'),
+    h2='Код формы 0409101')
+
+F101_FORM = page(
+    tr('<th colspan="4">Оборотная ведомость</th>') +
+    tr('Наименование', 'Счет', 'Рубли', 'Валюта') +
+    tr('', '', 'тыс. руб.', 'тыс. руб.') +
+    tr('1', '2', '3', '4') +
+    tr('Касса', '20202', '100', '20') +
+    tr('Уставный капитал', '10207', '1 000', ''),
+    h2='Форма 0409101')
+
+F102_WIDE = page(
+    tr('Отчет о финансовых результатах') +
+    tr('<td colspan="2">Наименование</td>', 'Символ', '<td colspan="2">Код</td>') +
+    tr('1', '2', '3', '4', '5', '6') +
+    tr('Доходы', '', '', '', '', '') +
+    tr('Процентные доходы', '', '11101', '', '', '1 234,5') +
+    tr('Комиссии', '', '11102', '', '', '99'))
+
+F102_NARROW = page(
+    tr('Наименование', 'Символ', 'Сумма') +
+    tr('Процентные доходы', '11101', '1 234') +
+    tr('Прочие', '', '') +
+    tr('Расходы', '33001', '7,5'))
+
+F123 = page(
+    tr('Номер строки', 'Наименование', 'Сумма') +
+    tr('0', 'Собственные средства', '5 000') +
+    tr('', '', '') +
+    tr('100', 'Источники капитала', '4 000') +
+    tr('100.1', 'Уставный капитал', '-'))
+
+F135 = page(
+    tr('Счет', 'Сумма') + tr('8700.0', '1 234'),
+    tr('Норматив', 'Значение') + tr('Н1.0', '12,5') + tr('Н2', '80'),
+    after='<ul class="without_dash without_indent"><li>Н18 = 7,5</li><li>Н20.0 = 1</li></ul>')
+
+
+@pytest.mark.parametrize('page', [F101_CODE, F101_FORM, F102_WIDE, F102_NARROW, F123, F135],
+                         ids=['101-code', '101-form', '102-wide', '102-narrow', '123', '135'])
+def test_form_pages_as_read_html(page):
+    assert_parity(page)
+
+
+def test_form101_code_layout():
+    numbers, balances, errors = Form101._parse_page(F101_CODE)
+    assert list(numbers) == ['10207', '20202', '30102']
+    assert list(balances) == [1000.5, -1500, 7000]
+    assert errors == []
+
+
+def test_form101_form_layout():
+    numbers, balances, errors = Form101._parse_page(F101_FORM)
+    assert list(numbers) == ['20202', '10207']
+    assert list(balances) == [120, 1000]
+
+
+def test_form102_layouts():
+    numbers, balances, _ = Form102._parse_page(F102_WIDE)
+    assert list(numbers) == ['11101', '11102']
+    assert list(balances) == [1234.5, 99]
+
+    numbers, balances, _ = Form102._parse_page(F102_NARROW)
+    assert list(numbers) == ['11101', '33001']
+    assert list(balances) == [1234, 7.5]
+
+
+def test_form123():
+    numbers, balances, _ = Form123._parse_page(F123)
+    assert list(numbers) == ['0', '100', '100.1']
+    assert list(balances) == [5000, 4000, 0]
+
+
+def test_form135():
+    numbers, balances, _ = Form135._parse_page(F135)
+    assert list(numbers) == ['8700.0', 'Н1.0', 'Н2', 'Н18', 'Н20.0']
+    assert np.allclose(balances, [1234, 0.125, 0.8, 7.5, 1])
+
+
+@pytest.mark.parametrize('table', [
+    # Header in <thead>, cells right in <thead>, footer
+    '<thead>%s%s</thead><tbody>%s</tbody><tfoot>%s</tfoot>' % (
+        tr('a', 'b', tag='th'), tr('', ''), tr('1', '2'), tr('3', '4')),
+    '<thead><th>a</th><th>b</th></thead>%s' % tr('1', '2'),
+    # Several leading rows of th cells, the empty one is not a header
+    tr('a', 'b', tag='th') + tr('c', 'd', tag='th') + tr('', '', tag='th') + tr('1', '2'),
+    # Rows with one or no text cells: kept in wide tables, skipped in narrow
+    tr('a', 'b') + tr('') + tr() + tr('1', '2'),
+    tr('a') + tr('') + tr(' ') + tr('b') + tr(),
+    tr('', tag='th') + tr('') + tr('a') + tr('b'),
+    # Spanned cells
+    tr('<td rowspan="3">a</td>', '<td colspan="2">b</td>') + tr('1', '2') + tr('3'),
+    tr('<th colspan="3">h</th>') + tr('<td rowspan="2">a</td>', 'b') + tr('c', 'd', 'e'),
+    # Hidden cells and rows, line breaks and whitespace
+    tr('a', '<td style="display: none">x</td>', 'b') +
+    '<tr style="display:none"><td>y</td></tr>' + tr(' 1<br>2 ', '3\n\n 4'),
+])
+def test_table_edge_cases(table):
+    assert_parity(page(table))
+
+
+def test_tables_numbered_as_read_html():
+    hidden = '<table style="display:none"><tr><td>x</td></tr></table>'
+    empty = '<table><caption>Нет данных</caption></table><table><tr><td></td></tr></table>'
+    report = page(tr('a', 'b') + tr('1', '2'), tr('h', tag='th'),
+                  after=hidden + empty + '<table>%s</table>' % tr('c'))
+    assert_parity(report)
+    assert ReportPage(report).table(2).shape == (0, 1)
+    assert ReportPage(report).table(3).tolist() == [['c']]
+
+
+@pytest.mark.parametrize('body', [b'', b' \r\n'])
+def test_empty_page(body):
+    with pytest.raises(ValueError) as e:
+        ReportPage(body)
+    # Errors of parse processes are pickled back to the crawler
+    pickle.loads(pickle.dumps(e.value))
+    with pytest.raises(ValueError):
+        Form102._parse_page(body)
+
+
+def test_filled_rows():
+    table = np.array([['a', '1'], ['', '2'], ['b', '']], dtype=object)
+    assert filled_rows(table).tolist() == [True, False, False]
+    assert filled_rows(table, [1]).tolist() == [True, True, False]
@@ -0,0 +1,95 @@
+import pytest
+
+from banks import Bank, BankScraper
+from banks.bank import BANK_PAGE_URL_PATTERN
+from banks.exceptions import FetchError
+from banks.forms import Form102
+from banks.pipeline import Pipeline
+
+from conftest import report_url, site
+
+DATES = {'2016-06-01': 10, '2016-07-01': 20, '2016-08-01': 30}
+
+# Both ways of load_forms: asyncio crawler and staged pipeline
+LOADERS = [None, Pipeline(io_workers=2, parse_workers=0)]
+LOADER_IDS = ['async', 'pipeline']
+
+
+def load(transport, bank_ids, pipeline, **kwargs):
+    scraper = BankScraper(2, transport=transport)
+    banks = [Bank(i, i, 'b', transport) for i in bank_ids]
+    return scraper.load_forms(banks, [Form102], pipeline=pipeline, **kwargs)
+
+
+@pytest.mark.parametrize('pipeline', LOADERS, ids=LOADER_IDS)
+def test_all_reports(pipeline):
+    transport = site({1: DATES, 2: DATES})
+    panels, failed = load(transport, [1, 2], pipeline)
+    assert failed == []
+    panel = panels['f_102']
+    assert panel.shape == (2, 3, 271)
+    assert panel.sel(banks=[2], items=['11101']).rows.ravel().tolist() == [10, 20, 30]
+
+
+@pytest.mark.parametrize('pipeline', LOADERS, ids=LOADER_IDS)
+def test_failed_report_is_a_failed_unit(pipeline):
+    transport = site({1: DATES, 2: DATES})
+    url = report_url('f_102', 1, '2016-07-01')
+    transport.pages[url] = FetchError(url, 500)
+    panels, failed = load(transport, [1, 2], pipeline)
+
+    assert [(unit.bank_id, str(unit.date)[:10], unit.url) for unit in failed] == \
+        [(1, '2016-07-01', url)]
+    assert panels['f_102'].shape == (2, 3, 271)
+    assert len(panels['f_102'].sel(banks=[1]).rows) == 2
+
+
+@pytest.mark.parametrize('pipeline', LOADERS, ids=LOADER_IDS)
+def test_failed_bank_page(pipeline):
+    transport = site({1: DATES, 2: DATES})
+    url = BANK_PAGE_URL_PATTERN % 2
+    transport.pages[url] = FetchError(url, 503)
+    panels, failed = load(transport, [1, 2], pipeline)
+
+    assert [(unit.bank_id, unit.date, unit.url) for unit in failed] == [(2, None, url)]
+    assert list(panels['f_102'].banks) == [1]
+
+
+@pytest.mark.parametrize('pipeline', LOADERS, ids=LOADER_IDS)
+def test_unparsable_report_is_failed_and_evicted(pipeline):
+    transport = site({1: DATES})
+    url = report_url('f_102', 1, '2016-08-01')
+    transport.pages[url] = b'<html><body>Service unavailable</body></html>'
+    panels, failed = load(transport, [1], pipeline)
+
+    assert [unit.url for unit in failed] == [url]
+    assert isinstance(failed[0].error, ValueError)
+    assert transport.evicted == [url]
+    assert panels['f_102'].shape == (1, 2, 271)
+
+
+@pytest.mark.parametrize('pipeline', LOADERS, ids=LOADER_IDS)
+@pytest.mark.parametrize('page', ['bank', 'report'])
+def test_other_errors_are_raised(pipeline, page):
+    transport = site({1: DATES, 2: DATES})
+    url = BANK_PAGE_URL_PATTERN % 2 if page == 'bank' else report_url('f_102', 2, '2016-07-01')
+    transport.pages[url] = RuntimeError('bug')
+    with pytest.raises(RuntimeError):
+        load(transport, [1, 2], pipeline)
+
+
+def test_parse_processes():
+    transport = site({1: DATES, 2: DATES})
+    url = report_url('f_102', 1, '2016-06-01')
+    transport.pages[url] = b'<html></html>'
+    panels, failed = load(transport, [1, 2], Pipeline(io_workers=2, parse_workers=1))
+
+    assert [unit.url for unit in failed] == [url]
+    assert isinstance(failed[0].error, ValueError)
+    assert panels['f_102'].sel(banks=[2], items=['11101']).rows.ravel().tolist() == [10, 20, 30]
+
+
+def test_pool_size_follows_concurrency():
+    transport = site({1: DATES})
+    load(transport, [1], None, concurrency=40)
+    assert transport.pool_size == 40
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from banks.registry import BankRegistry, normalize_name
+
+ACTIVE = pd.DataFrame({'id': [1, 2, 3],
+                       'license_number': ['1481', '1000', '2209'],
+                       'name': ['ПАО Сбербанк', 'Банк ВТБ (ПАО)', 'АО «Сбер-Ёлка Банк»']})
+CLOSED = pd.DataFrame({'id': [4, -1],
+                       'license_number': ['3000', '3001'],
+                       'bank': ['Сбербанк-Регион', 'Мосбизнесбанк'],
+                       'name': ['ООО Сбербанк-Регион', 'АКБ Мосбизнесбанк']})
+
+
+@pytest.fixture
+def registry():
+    return BankRegistry(ACTIVE, CLOSED)
+
+
+def test_normalize_name():
+    assert normalize_name('АО «Сбер-Ёлка Банк»') == ['сбер', 'елка', 'банк']
+
+
+def test_lookups(registry):
+    assert len(registry) == 5
+    assert registry.by_license(1481) is registry.by_license('1481')
+    assert registry.by_id('2').name == 'Банк ВТБ (ПАО)'
+    assert registry.is_closed(registry.by_license('3000'))
+    assert not registry.is_closed(registry.by_id(1))
+    assert [bank.license_number for bank in registry.closed] == ['3000']
+    assert len(registry.active) == 3
+
+
+def test_search(registry):
+    found = [bank.license_number for bank in registry.search('сбер')]
+    # Active banks first, then shorter names
+    assert found == ['1481', '2209', '3000']
+    assert [bank.license_number for bank in registry.search('ЕЛКА сбер')] == ['2209']
+    assert [bank.license_number for bank in registry.search('пао втб')] == ['1000']
+    assert [bank.license_number for bank in registry.search('сбер', limit=1)] == ['1481']
+    assert registry.search('альфа') == []
+    assert registry.search('ООО') == []
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+
+from banks.forms import Form102, FormPanel
+
+from conftest import filled
+
+pytest.importorskip('pyarrow')
+import banks.store  # noqa: E402
+from banks.store import FormStore  # noqa: E402
+
+
+@pytest.fixture(params=['parquet', 'feather'])
+def store(request, tmp_path):
+    return FormStore(str(tmp_path), request.param)
+
+
+def test_latest_write_wins(store):
+    store.write([filled(Form102, 1, ['2016-07-01', '2016-08-01'], 1),
+                 filled(Form102, 2, ['2016-08-01'], 2)])
+    store.write([filled(Form102, 1, ['2016-08-01'], 3)])
+
+    panel = store.read('f_102', items=['11101'])
+    assert panel.shape == (2, 2, 1)
+    values = panel.values[:, :, 0]
+    assert values[list(panel.banks).index('1')].tolist() == [1, 3]
+    assert values[list(panel.banks).index('2')].tolist()[1] == 2
+
+
+def test_writes_in_one_clock_tick(store, monkeypatch):
+    monkeypatch.setattr(banks.store.time, 'time_ns', lambda: 1)
+    for value in (1, 2, 3):
+        store.write([filled(Form102, 1, ['2016-08-01'], value)])
+
+    directory = os.path.join(store.path, 'form=f_102', 'date=2016-08-01')
+    assert len(os.listdir(directory)) == 3
+    assert store.read('f_102').rows.ravel()[0] == 3
+
+
+def test_filters(store):
+    store.write([filled(Form102, bank, ['2016-06-01', '2016-07-01', '2016-08-01'], bank)
+                 for bank in (1, 2, 3)])
+
+    panel = store.read('f_102', banks=[2, 3], items=['11102', '11101'])
+    assert sorted(panel.banks) == ['2', '3']
+    assert list(panel.numbers) == ['11101', '11102']
+    assert panel.shape == (2, 3, 2)
+
+    assert len(store.read('f_102', dates=['2016-07-01']).dates) == 1
+    assert len(store.read('f_102', since='2016-07-01').dates) == 2
+    assert len(store.read('f_102', until='2016-06-15').dates) == 1
+    assert store.read('f_102', banks=[4]).shape == (0, 0, 271)
+    assert store.dates('f_102').astype('datetime64[D]').astype(str).tolist() == [
+        '2016-06-01', '2016-07-01', '2016-08-01']
+
+
+def test_only_whole_forms(store):
+    panel = FormPanel.from_forms([filled(Form102, 1, ['2016-08-01'], 1)]).sel(items=['11101'])
+    with pytest.raises(ValueError):
+        store.write(panel)
+
+
+def test_duplicate_reports(store):
+    with pytest.raises(ValueError):
+        store.write([filled(Form102, 1, ['2016-08-01'], 1), filled(Form102, 1, ['2016-08-01'], 2)])
+    assert np.asarray(store.dates('f_102')).size == 0